@@ -0,0 +1,81 @@
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+from .reports import keep_deleted_order_sales
+
+logger = logging.getLogger(__name__)
+
+CLOSED_STATUSES = ['delivered', 'cancelled']
+
+ORDER_FIELDS = [
+    'id', 'user_id', 'delivery_crew_id', 'status', 'total', 'date', 'created_at', 'updated_at',
+]
+ITEM_FIELDS = ['id', 'order_id', 'menu_item_id', 'quantity', 'unit_price', 'price']
+
+def archive_closed_orders(days=90, chunk_size=500, dry_run=False):
+    """
+    Move delivered and cancelled orders older than `days` days, with their
+    items, into the archive tables.
+    
+    Each chunk is copied and deleted in its own short transaction, skipping
+    rows another worker has locked, so live tables are never locked for long.
+    Orders whose ids are already in the archive are left in place and logged
+    rather than overwritten or lost, and the rest are archived around them.
+    Returns the number of orders archived (or that would be, for a dry run).
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    closed = Order.objects.filter(status__in=CLOSED_STATUSES, created_at__lt=cutoff)
+    already_archived = ArchivedOrder.objects.values('pk')
+    conflicts = list(closed.filter(pk__in=already_archived).order_by('pk').values_list('pk', flat=True))
+    if conflicts:
+        logger.warning(
+            'Skipping %d closed orders whose ids are already archived: %s',
+            len(conflicts),
+            ', '.join(map(str, conflicts)),
+            extra={'archive_conflicts': conflicts}
+        )
+    closed = closed.exclude(pk__in=already_archived)
+    if dry_run:
+        return closed.count()
+    
+    archived = 0
+    while True:
+        with transaction.atomic():
+            orders = list(
+                closed.select_for_update(skip_locked=True)
+                .order_by('pk')
+                .values(*ORDER_FIELDS)[:chunk_size]
+            )
+            if not orders:
+                break
+            order_ids = [order['id'] for order in orders]
+            items = list(
+                OrderItem.objects.filter(order_id__in=order_ids)
+                .values(*ITEM_FIELDS, 'menu_item__name')
+            )
+            
+            # No ignore_conflicts: an id archived since the chunk was read must
+            # abort it rather than delete a live order that was never copied
+            ArchivedOrder.objects.bulk_create([ArchivedOrder(**order) for order in orders])
+            ArchivedOrderItem.objects.bulk_create(
+                [
+                    ArchivedOrderItem(
+                        menu_item_name=item.pop('menu_item__name'),
+                        **item
+                    )
+                    for item in items
+                ]
+            )
+            # Archived orders still count towards sales
+            with keep_deleted_order_sales():
+                Order.objects.filter(pk__in=order_ids).delete()
+        
+        archived += len(orders)
+        if len(orders) < chunk_size:
+            break
+    
+    return archived
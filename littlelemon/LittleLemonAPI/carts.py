@@ -0,0 +1,281 @@
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal
+from functools import cache as memoize
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Cart, MenuItem
+
+logger = logging.getLogger(__name__)
+
+def upsert_cart_rows(user_id, lines):
+    """
+    Write {menu_item_id: (quantity, unit_price)} lines for one user in a
+    single INSERT ... ON CONFLICT/DUPLICATE KEY UPDATE on (user, menu_item).
+    """
+    rows = [
+        Cart(
+            user_id=user_id,
+            menu_item_id=menu_item_id,
+            quantity=quantity,
+            unit_price=unit_price,
+            price=unit_price * quantity
+        )
+        for menu_item_id, (quantity, unit_price) in lines.items()
+    ]
+    supports_target = connection.features.supports_update_conflicts_with_target
+    Cart.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user', 'menu_item'] if supports_target else None,
+        update_fields=['quantity', 'unit_price', 'price', 'updated_at']
+    )
+    return rows
+
+class DatabaseCartBackend:
+    """Cart lines live in the Cart table; every change is a database write."""
+
+    def lines(self, user):
+        return Cart.objects.filter(user=user)
+
+    def add(self, user, lines):
+        """
+        Set quantities for {menu_item_id: (quantity, unit_price)} and return
+        the written lines.
+        """
+        rows = upsert_cart_rows(user.pk, lines)
+        if any(row.pk is None for row in rows):
+            # Backends that can't return ids from upserts (MySQL)
+            rows = list(Cart.objects.filter(user=user, menu_item_id__in=lines))
+        return rows
+
+    def summary(self, user):
+        """Item count, subtotal and line count of a user's cart in one aggregate query."""
+        return Cart.objects.filter(user=user).aggregate(
+            item_count=Coalesce(Sum('quantity'), 0),
+            subtotal=Coalesce(Sum('price'), Value(Decimal('0.00')), output_field=DecimalField()),
+            line_count=Count('id')
+        )
+
+    def clear(self, user):
+        Cart.objects.filter(user=user).delete()
+
+    def persist(self, user):
+        """Make sure the Cart table holds the user's lines (always true here)."""
+
+    def evict(self, user_ids):
+        """Forget anything held outside the Cart table for these users."""
+
+    def flush(self):
+        return 0
+
+class CacheCartBackend:
+    """
+    Cart lines live in the Django cache and are written to the Cart table
+    behind the request: for one user at checkout, for everyone changed since
+    the last run by flush_carts. A cache miss reloads the user's lines from
+    the table, so evicted carts fall back to their last flushed state.
+
+    Cached lines are priced at the current menu price whenever they are read
+    or written back, so menu price changes reach them without a sweep. They
+    have no Cart row id, so they are identified by their menu item id, which
+    is unique within a cart.
+
+    Changed carts are found again through a per-user dirty mark and an
+    append-only log of marked user ids, numbered by an atomic counter, so
+    concurrent writers never lose each other's marks.
+
+    Updates to one user's cart are read-modify-write on a single cache key;
+    concurrent changes to the same cart can overwrite each other.
+    """
+    KEY = 'littlelemon:cart:{}'
+    DIRTY_KEY = 'littlelemon:cart:dirty:{}'
+    # Counter numbering the dirty log, the last number flush has handled and a log entry
+    DIRTY_SEQ_KEY = 'littlelemon:cart:dirty-seq'
+    FLUSHED_SEQ_KEY = 'littlelemon:cart:flushed-seq'
+    DIRTY_LOG_KEY = 'littlelemon:cart:dirty-log:{}'
+
+    def load(self, user_id):
+        """{menu_item_id: (quantity, unit_price)} for a user, from cache or table."""
+        stored = cache.get(self.KEY.format(user_id))
+        if stored is None:
+            lines = {
+                menu_item_id: (quantity, unit_price)
+                for menu_item_id, quantity, unit_price in Cart.objects.filter(user_id=user_id)
+                .values_list('menu_item_id', 'quantity', 'unit_price')
+            }
+            self.store(user_id, lines, dirty=False)
+            return lines
+        return {int(pk): (quantity, Decimal(price)) for pk, (quantity, price) in stored.items()}
+
+    def store(self, user_id, lines, dirty=True):
+        cache.set(
+            self.KEY.format(user_id),
+            {pk: (quantity, str(price)) for pk, (quantity, price) in lines.items()},
+            settings.CART_CACHE_TIMEOUT
+        )
+        if dirty:
+            self.mark_dirty(user_id)
+
+    def mark_dirty(self, user_id):
+        # Carts already marked are logged once until flush clears the mark
+        if cache.add(self.DIRTY_KEY.format(user_id), True, None):
+            cache.add(self.DIRTY_SEQ_KEY, 0, None)
+            cache.set(self.DIRTY_LOG_KEY.format(cache.incr(self.DIRTY_SEQ_KEY)), user_id, None)
+
+    def priced(self, lines):
+        """
+        Lines at current menu prices, without items deleted from the menu
+        since they were added.
+        """
+        prices = dict(MenuItem.objects.filter(pk__in=lines).values_list('pk', 'price'))
+        return {
+            menu_item_id: (quantity, prices[menu_item_id])
+            for menu_item_id, (quantity, _) in lines.items()
+            if menu_item_id in prices
+        }
+
+    def lines(self, user):
+        lines = self.load(user.pk)
+        menu_items = MenuItem.objects.select_related('category').in_bulk(lines)
+        return [
+            Cart(
+                id=menu_item_id,
+                user=user,
+                menu_item=menu_items[menu_item_id],
+                quantity=quantity,
+                unit_price=menu_items[menu_item_id].price,
+                price=menu_items[menu_item_id].price * quantity
+            )
+            for menu_item_id, (quantity, _) in lines.items()
+            if menu_item_id in menu_items
+        ]
+
+    def summary(self, user):
+        lines = self.priced(self.load(user.pk)).values()
+        return {
+            'item_count': sum(quantity for quantity, _ in lines),
+            'subtotal': sum((unit_price * quantity for quantity, unit_price in lines), Decimal('0.00')),
+            'line_count': len(lines),
+        }
+
+    def add(self, user, lines):
+        stored = self.load(user.pk)
+        stored.update(lines)
+        self.store(user.pk, stored)
+        return [
+            Cart(
+                id=menu_item_id,
+                user=user,
+                menu_item_id=menu_item_id,
+                quantity=quantity,
+                unit_price=unit_price,
+                price=unit_price * quantity
+            )
+            for menu_item_id, (quantity, unit_price) in lines.items()
+        ]
+
+    def clear(self, user):
+        Cart.objects.filter(user=user).delete()
+        # Drop the cached lines so the next read reloads from the table; again
+        # after commit in case a concurrent read cached the rows being deleted
+        key = self.KEY.format(user.pk)
+        cache.delete(key)
+        transaction.on_commit(lambda: cache.delete(key))
+
+    def write(self, user_id, lines):
+        """Replace a user's Cart rows with the given lines."""
+        Cart.objects.filter(user_id=user_id).exclude(menu_item_id__in=lines).delete()
+        if lines:
+            upsert_cart_rows(user_id, lines)
+
+    def persist(self, user):
+        self.write(user.pk, self.priced(self.load(user.pk)))
+
+    def evict(self, user_ids):
+        # Carts changed since the last flush hold lines the table doesn't have yet
+        dirty = cache.get_many([self.DIRTY_KEY.format(user_id) for user_id in user_ids])
+        cache.delete_many([
+            self.KEY.format(user_id) for user_id in user_ids
+            if self.DIRTY_KEY.format(user_id) not in dirty
+        ])
+
+    def flush(self):
+        """Write every cart changed since the last flush. Returns how many."""
+        flushed = cache.get(self.FLUSHED_SEQ_KEY, 0)
+        latest = cache.get(self.DIRTY_SEQ_KEY, 0)
+        log_keys = [self.DIRTY_LOG_KEY.format(seq) for seq in range(flushed + 1, latest + 1)]
+        user_ids = set(cache.get_many(log_keys).values())
+        for user_id in user_ids:
+            # Clear the mark first: a change made while writing marks the cart again
+            cache.delete(self.DIRTY_KEY.format(user_id))
+            try:
+                with transaction.atomic():
+                    self.write(user_id, self.priced(self.load(user_id)))
+            except Exception:
+                self.mark_dirty(user_id)
+                raise
+        cache.set(self.FLUSHED_SEQ_KEY, latest, None)
+        cache.delete_many(log_keys)
+        return len(user_ids)
+
+def sweep_expired_carts(days=None, batch_size=1000):
+    """
+    Delete cart lines nobody has touched for `days` days (CART_EXPIRY_DAYS
+    by default).
+
+    Lines are deleted oldest first, batch_size at a time, each batch in its
+    own short transaction that skips rows a checkout has locked, so the Cart
+    table is never locked for long. Returns, and logs, how many lines were
+    reclaimed from how many carts.
+    """
+    days = settings.CART_EXPIRY_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    expired = Cart.objects.filter(updated_at__lt=cutoff)
+    backend = get_cart_backend()
+    # Write-behind carts reach the table (and renew their lines) before anything expires
+    backend.flush()
+    stats = {'lines': 0, 'carts': 0, 'batches': 0}
+    carts = set()
+    start = time.monotonic()
+    while True:
+        with transaction.atomic():
+            lines = list(
+                expired.select_for_update(skip_locked=True)
+                .order_by('updated_at', 'pk')
+                .values_list('pk', 'user_id')[:batch_size]
+            )
+            if not lines:
+                break
+            Cart.objects.filter(pk__in=[pk for pk, _ in lines]).delete()
+            user_ids = {user_id for _, user_id in lines}
+            backend.evict(user_ids)
+        stats['lines'] += len(lines)
+        carts |= user_ids
+        stats['batches'] += 1
+        if len(lines) < batch_size:
+            break
+    stats['carts'] = len(carts)
+    stats['seconds'] = round(time.monotonic() - start, 3)
+    logger.info(
+        'Reclaimed %(lines)d expired cart lines from %(carts)d carts in %(batches)d batches (%(seconds)ss)',
+        stats,
+        extra={'cart_sweep': stats}
+    )
+    return stats
+
+@memoize
+def load_cart_backend(path):
+    return import_string(path)()
+
+def get_cart_backend():
+    """The backend named by the CART_BACKEND setting."""
+    return load_cart_backend(settings.CART_BACKEND)
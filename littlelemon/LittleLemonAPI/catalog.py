@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Subquery
+from django.utils import timezone
+
+from .models import CatalogVersion, MenuItem
+
+CATALOG_VERSION_PK = 1
+
+# Shared by every worker; keep the timeout short when the cache is per-process
+CATALOG_VERSION_CACHE_KEY = 'littlelemon:catalog:version'
+CATALOG_VERSION_CACHE_TIMEOUT = 10
+
+def bump_catalog_version():
+    """Record that the menu catalog changed."""
+    updated = CatalogVersion.objects.filter(pk=CATALOG_VERSION_PK).update(
+        version=F('version') + 1,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        CatalogVersion.objects.get_or_create(pk=CATALOG_VERSION_PK, defaults={'version': 1})
+    cache.delete(CATALOG_VERSION_CACHE_KEY)
+    # Drop it again on commit in case a reader re-cached the old version meanwhile
+    transaction.on_commit(lambda: cache.delete(CATALOG_VERSION_CACHE_KEY))
+
+def load_catalog_version():
+    """
+    Read (etag, last_modified) from the database in a single query, combining
+    the change counter with the newest MenuItem.updated_at.
+    """
+    newest_item = MenuItem.objects.order_by('-updated_at').values('updated_at')[:1]
+    row = (
+        CatalogVersion.objects.filter(pk=CATALOG_VERSION_PK)
+        .annotate(menu_updated_at=Subquery(newest_item))
+        .values('version', 'updated_at', 'menu_updated_at')
+        .first()
+    )
+    if row is None:
+        CatalogVersion.objects.get_or_create(pk=CATALOG_VERSION_PK)
+        return load_catalog_version()
+    
+    menu_updated_at = row['menu_updated_at']
+    last_modified = max(filter(None, [row['updated_at'], menu_updated_at]))
+    stamp = int(menu_updated_at.timestamp() * 1000000) if menu_updated_at else 0
+    return (f"catalog-{row['version']}-{stamp}", last_modified)
+
+def get_catalog_version(request=None):
+    """
+    Return (etag, last_modified) for the catalog from the shared cache,
+    falling back to the database. The result is memoized on the request so
+    ETag and Last-Modified checks share it.
+    """
+    version = getattr(request, '_catalog_version', None)
+    if version is not None:
+        return version
+    
+    version = cache.get(CATALOG_VERSION_CACHE_KEY)
+    if version is None:
+        version = load_catalog_version()
+        cache.set(CATALOG_VERSION_CACHE_KEY, version, CATALOG_VERSION_CACHE_TIMEOUT)
+    if request is not None:
+        request._catalog_version = version
+    return version
+
+def catalog_etag(request, *args, **kwargs):
+    return get_catalog_version(request)[0]
+
+def catalog_last_modified(request, *args, **kwargs):
+    return get_catalog_version(request)[1]
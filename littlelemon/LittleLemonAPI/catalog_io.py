@@ -0,0 +1,205 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .images import schedule_image_variants
+from .models import Category, MenuItem
+from .serializers import MenuItemImportSerializer
+from .signals import menu_items_bulk_changed
+
+FORMATS = ('csv', 'jsonl')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Exported columns, which import_menu reads back
+COLUMNS = ['id', 'name', 'description', 'price', 'category', 'is_featured', 'image']
+
+def format_from_name(name, default='csv'):
+    """csv or jsonl from a file name's extension."""
+    if name and name.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name and name.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+def read_rows(stream, file_format):
+    """
+    Yield (line number, row dict) from a text stream without loading it
+    whole. Unparseable JSON lines yield their error message instead of a dict.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if key}
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, f'Invalid JSON: {e}'
+            continue
+        yield line_number, row if isinstance(row, dict) else 'Each line must be a JSON object.'
+
+def resolve_categories(values):
+    """
+    Map category slugs or names to Category ids in a fixed number of queries,
+    creating categories that don't exist yet.
+    """
+    values = set(values)
+    found = {}
+    for pk, name, slug in Category.objects.filter(Q(slug__in=values) | Q(name__in=values)).values_list('pk', 'name', 'slug'):
+        found[name] = found[slug] = pk
+    missing = {value: slugify(value) for value in values if value not in found}
+    if missing:
+        Category.objects.bulk_create(
+            [Category(name=value, slug=slug) for value, slug in missing.items()],
+            ignore_conflicts=True
+        )
+        for pk, slug in Category.objects.filter(slug__in=missing.values()).values_list('pk', 'slug'):
+            for value, missing_slug in missing.items():
+                if missing_slug == slug:
+                    found[value] = pk
+    return found
+
+def import_batch(rows, report):
+    """Validate and upsert one batch of (line number, row) pairs."""
+    valid = []
+    for line_number, row in rows:
+        if isinstance(row, str):
+            report['errors'].append({'row': line_number, 'errors': {'non_field_errors': [row]}})
+            continue
+        # Blank CSV cells mean "not given"
+        row = {key: value for key, value in row.items() if value not in ('', None) or key in ('description', 'image')}
+        serializer = MenuItemImportSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((line_number, serializer.validated_data))
+        else:
+            report['errors'].append({'row': line_number, 'errors': serializer.errors})
+    if not valid:
+        return
+
+    with transaction.atomic():
+        categories = resolve_categories(data['category'] for _, data in valid)
+        ids = {data['id'] for _, data in valid if data.get('id')}
+        by_id = MenuItem.objects.in_bulk(ids)
+        by_key = {
+            (item.category_id, item.name): item
+            for item in MenuItem.objects.filter(
+                category_id__in=set(categories.values()),
+                name__in={data['name'] for _, data in valid}
+            )
+        }
+
+        created, updated, images = {}, {}, []
+        # bulk_update skips auto_now; stamp changes so the catalog version sees them
+        now = timezone.now()
+        for line_number, data in valid:
+            category_id = categories.get(data['category'])
+            if category_id is None:
+                report['errors'].append({'row': line_number, 'errors': {'category': ['Could not create this category.']}})
+                continue
+            key = (category_id, data['name'])
+            if data.get('id'):
+                item = by_id.get(data['id'])
+                if item is None:
+                    report['errors'].append({'row': line_number, 'errors': {'id': ['No menu item with this id.']}})
+                    continue
+            else:
+                item = by_key.get(key) or created.get(key)
+            if item is None:
+                item = MenuItem()
+                created[key] = item
+            elif item.pk:
+                updated[item.pk] = item
+            old_image = item.image.name
+            item.name = data['name']
+            item.price = data['price']
+            item.category_id = category_id
+            # Optional columns missing from the row leave existing values alone
+            for field in ('description', 'is_featured', 'image'):
+                if field in data:
+                    setattr(item, field, data[field])
+            item.updated_at = now
+            if item.image.name != old_image:
+                item.image_variants = {}
+                images.append(item)
+            by_key[key] = item
+
+        MenuItem.objects.bulk_create(created.values())
+        if any(item.pk is None for item in created.values()):
+            # Backends that can't return ids from bulk inserts (MySQL): the
+            # newest item per (category, name) is the one just created
+            for pk, category_id, name in MenuItem.objects.filter(
+                category_id__in={key[0] for key in created},
+                name__in={key[1] for key in created}
+            ).order_by('pk').values_list('pk', 'category_id', 'name'):
+                if (category_id, name) in created:
+                    created[category_id, name].pk = pk
+        MenuItem.objects.bulk_update(
+            updated.values(),
+            ['name', 'description', 'price', 'category', 'is_featured', 'image', 'image_variants', 'updated_at']
+        )
+        item_ids = [item.pk for item in created.values()] + list(updated)
+        # bulk writes skip save signals; let catalog caches and projections catch up
+        menu_items_bulk_changed.send(sender=MenuItem, item_ids=item_ids)
+        for item in images:
+            if item.image:
+                schedule_image_variants(item)
+    report['created'] += len(created)
+    report['updated'] += len(updated)
+
+def import_menu(stream, file_format='csv', batch_size=500):
+    """
+    Upsert menu items from a CSV or JSONL text stream in batches of
+    batch_size, one transaction per batch. Returns a report with created and
+    updated counts and the errors of rejected rows by line number.
+    """
+    report = {'created': 0, 'updated': 0, 'errors': []}
+    rows = read_rows(stream, file_format)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        import_batch(batch, report)
+    return report
+
+class Echo:
+    """File-like object whose write() returns what was written, for csv.writer."""
+    def write(self, value):
+        return value
+
+def export_menu(file_format='csv', chunk_size=1000):
+    """
+    Yield the catalog as CSV or JSONL text, one line at a time, reading the
+    table in chunks so memory stays constant however large it is.
+    """
+    rows = (
+        MenuItem.objects.order_by('pk')
+        .values_list('pk', 'name', 'description', 'price', 'category__slug', 'is_featured', 'image')
+        .iterator(chunk_size=chunk_size)
+    )
+    if file_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(COLUMNS)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            record = dict(zip(COLUMNS, row))
+            record['price'] = str(record['price'])
+            yield json.dumps(record) + '\n'
+
+def text_stream(binary):
+    """Wrap an uploaded (binary) file for read_rows."""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
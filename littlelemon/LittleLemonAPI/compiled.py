@@ -0,0 +1,194 @@
+from collections import defaultdict
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Fields whose to_representation returns database values unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+)
+
+def orm_path(prefix, source):
+    return prefix + source.replace('.', '__')
+
+def file_url_accessor(field, model_field, request):
+    """FileField/ImageField output computed from the stored name alone."""
+    if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+        return lambda name: name or None
+    storage = model_field.storage
+    if isinstance(storage, FileSystemStorage):
+        # Local media URLs are the base URL plus the quoted name; resolve the
+        # base once instead of joining URLs for every row
+        base_url = storage.base_url
+        if request is not None:
+            base_url = request.build_absolute_uri(base_url)
+        return lambda name: base_url + filepath_to_uri(name).lstrip('/') if name else None
+    if request is None:
+        return lambda name: storage.url(name) if name else None
+    return lambda name: request.build_absolute_uri(storage.url(name)) if name else None
+
+def datetime_accessor(field):
+    """DateTimeField ISO 8601 output with the field's timezone resolved once."""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if field_timezone is None:
+        return field.to_representation
+    
+    def accessor(value):
+        if timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return accessor
+
+def field_accessor(field, model_field, request):
+    if isinstance(field, serializers.FileField):
+        return file_url_accessor(field, model_field, request)
+    if isinstance(field, serializers.DateTimeField):
+        return datetime_accessor(field)
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        # values() already yields the foreign key id
+        return None if field.pk_field is None else field.pk_field.to_representation
+    return field.to_representation
+
+class CompiledSerializer:
+    """
+    A read-only ModelSerializer flattened into values() paths and one
+    accessor per field, so list responses are built straight from rows
+    without instantiating models or walking DRF fields per object.
+
+    Output matches serializer.data for the same fields, ?fields= and
+    ?expand=. Nested serializers on foreign keys are read through joins in
+    the same row; nested many=True serializers on reverse foreign keys take
+    one extra query per relation, like a prefetch.
+    """
+
+    def __init__(self, serializer, prefix=''):
+        model = serializer.Meta.model
+        request = serializer.context.get('request')
+        self.model = model
+        self.pk_path = prefix + 'pk'
+        # (output name, values() path, accessor or None for passthrough)
+        self.columns = []
+        # (output name, values() path of the foreign key, compiled nested serializer)
+        self.nested = []
+        # (output name, related model, foreign key attname, compiled nested serializer)
+        self.many = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or isinstance(field, (serializers.SerializerMethodField, serializers.ManyRelatedField)):
+                raise ImproperlyConfigured(
+                    f'{type(serializer).__name__}.{name} cannot be compiled; '
+                    'only model fields and nested model serializers are supported.'
+                )
+            if isinstance(field, serializers.ListSerializer):
+                relation = model._meta.get_field(field.source)
+                if not relation.one_to_many:
+                    raise ImproperlyConfigured(
+                        f'{type(serializer).__name__}.{name} must be a reverse foreign key to be compiled.'
+                    )
+                self.many.append((
+                    name,
+                    relation.related_model,
+                    relation.field.attname,
+                    CompiledSerializer(field.child),
+                ))
+            elif isinstance(field, serializers.ModelSerializer):
+                path = orm_path(prefix, field.source)
+                compiled = CompiledSerializer(field, prefix=path + '__')
+                if compiled.many:
+                    raise ImproperlyConfigured(
+                        f'{type(serializer).__name__}.{name} nests a many=True serializer, which cannot be compiled.'
+                    )
+                self.nested.append((name, path, compiled))
+            else:
+                model_field = None
+                if '.' not in field.source:
+                    model_field = model._meta.get_field(field.source)
+                path = orm_path(prefix, field.source)
+                self.columns.append((name, path, field_accessor(field, model_field, request)))
+
+    @property
+    def paths(self):
+        """Every values() path this serializer reads."""
+        paths = [path for _, path, _ in self.columns]
+        for _, path, compiled in self.nested:
+            paths.append(path)
+            paths += compiled.paths
+        if self.many:
+            paths.append(self.pk_path)
+        return paths
+
+    def values(self, queryset, *extra):
+        """
+        The queryset as rows for render(). `extra` paths are selected too,
+        e.g. ordering fields a cursor paginator reads positions from.
+        """
+        paths = list(dict.fromkeys(self.paths + list(extra)))
+        return queryset.select_related(None).prefetch_related(None).values(*paths)
+
+    def render_row(self, row):
+        data = {}
+        for name, path, accessor in self.columns:
+            value = row[path]
+            if accessor is not None and value is not None:
+                value = accessor(value)
+            data[name] = value
+        for name, path, compiled in self.nested:
+            data[name] = None if row[path] is None else compiled.render_row(row)
+        return data
+
+    def render(self, rows):
+        rows = list(rows)
+        rendered = [self.render_row(row) for row in rows]
+        if self.many:
+            self.render_many(rows, rendered)
+        return rendered
+
+    def render_many(self, rows, rendered):
+        pks = [row[self.pk_path] for row in rows]
+        for name, related_model, attname, compiled in self.many:
+            children = defaultdict(list)
+            if pks:
+                queryset = related_model._default_manager.filter(**{f'{attname}__in': pks})
+                child_rows = list(compiled.values(queryset, attname))
+                for child_row, child in zip(child_rows, compiled.render(child_rows)):
+                    children[child_row[attname]].append(child)
+            for pk, data in zip(pks, rendered):
+                data[name] = children[pk]
+
+def compile_serializer(serializer_class, context=None):
+    """Compile serializer_class for one request's context (and its ?fields= / ?expand=)."""
+    return CompiledSerializer(serializer_class(context=context or {}))
+
+class CompiledListMixin:
+    """
+    Answers list GETs from values() rows through the compiled serializer
+    instead of serializing model instances. Ordering fields are selected too
+    so cursor pagination can read positions from the rows.
+    """
+    def list(self, request, *args, **kwargs):
+        compiled = compile_serializer(self.get_serializer_class(), self.get_serializer_context())
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = [field.lstrip('-') for field in queryset.query.order_by if isinstance(field, str)]
+        rows = compiled.values(queryset, *ordering)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compiled.render(page))
+        return Response(compiled.render(rows))
@@ -0,0 +1,80 @@
+import heapq
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .events import order_event, publish_on_commit
+from .models import Order
+from .roles import DELIVERY_CREW
+
+User = get_user_model()
+
+OPEN_STATUSES = ['pending', 'processing']
+
+def get_crew_loads():
+    """Return {user_id: open order count} for every active delivery crew member."""
+    crew = (
+        User.objects.filter(groups__name=DELIVERY_CREW, is_active=True)
+        .annotate(open_orders=Count(
+            'delivery_crew_orders',
+            filter=Q(delivery_crew_orders__status__in=OPEN_STATUSES)
+        ))
+        .values_list('pk', 'open_orders')
+    )
+    return dict(crew)
+
+def dispatch_pending_orders(batch_size=500, limit=None):
+    """
+    Assign unassigned pending orders to the least loaded delivery crew members.
+    
+    Orders are claimed oldest first in batches with SELECT ... FOR UPDATE SKIP
+    LOCKED, so several workers can run at once without assigning the same
+    order twice. Each batch issues one UPDATE per crew member it assigns to.
+    
+    Returns a dict of {crew user_id: orders assigned}.
+    """
+    assigned = defaultdict(int)
+    remaining = limit
+    
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        with transaction.atomic():
+            claimed = list(
+                Order.objects.select_for_update(skip_locked=True)
+                .filter(status='pending', delivery_crew__isnull=True)
+                .order_by('created_at', 'id')
+                .values_list('pk', 'user_id')[:size]
+            )
+            if not claimed:
+                break
+            
+            # Loads are re-read per batch so concurrent workers stay roughly balanced
+            loads = get_crew_loads()
+            if not loads:
+                break
+            heap = [(load, crew_id) for crew_id, load in loads.items()]
+            heapq.heapify(heap)
+            
+            batch = defaultdict(list)
+            events = []
+            for order_id, user_id in claimed:
+                load, crew_id = heapq.heappop(heap)
+                batch[crew_id].append(order_id)
+                heapq.heappush(heap, (load + 1, crew_id))
+                events.append(order_event(order_id, user_id, 'pending', crew_id, ['delivery_crew']))
+            
+            now = timezone.now()
+            for crew_id, ids in batch.items():
+                Order.objects.filter(pk__in=ids).update(delivery_crew_id=crew_id, updated_at=now)
+                assigned[crew_id] += len(ids)
+            publish_on_commit(*events)
+        
+        if remaining is not None:
+            remaining -= len(claimed)
+        if len(claimed) < size:
+            break
+    
+    return dict(assigned)
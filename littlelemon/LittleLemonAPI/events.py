@@ -0,0 +1,133 @@
+import asyncio
+import json
+import threading
+
+from django.db import transaction
+
+from .roles import MANAGER, DELIVERY_CREW
+
+# Queued to wake a stream whose user's roles changed
+ROLES_CHANGED = object()
+
+class Subscription:
+    """One connected client: an asyncio queue bound to the loop serving it."""
+
+    def __init__(self, user_id, roles, loop, maxsize=100):
+        self.user_id = user_id
+        self.roles = roles
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def wants(self, event):
+        """Scope events to the subscriber's role."""
+        if MANAGER in self.roles:
+            return True
+        if DELIVERY_CREW in self.roles:
+            return self.user_id in (event['delivery_crew'], event.get('previous_delivery_crew'))
+        return event['user'] == self.user_id
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow client; drop the event rather than buffer without bound
+            pass
+
+class OrderEventBroker:
+    """
+    In-process pub/sub for order events.
+
+    Publishers run in request or worker threads; subscribers are async
+    streaming views. This is a local stand-in for an external broker and
+    only reaches clients connected to the same process.
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id, roles):
+        subscription = Subscription(user_id, roles, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def roles_changed(self, user_ids):
+        """
+        Narrow these users' subscriptions to their own orders and wake their
+        streams to re-read roles.
+        """
+        user_ids = set(user_ids)
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if s.user_id in user_ids]
+        for subscription in subscriptions:
+            subscription.roles = frozenset()
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, ROLES_CHANGED)
+            except RuntimeError:
+                self.unsubscribe(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if not subscription.wants(event):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's event loop has closed
+                self.unsubscribe(subscription)
+
+broker = OrderEventBroker()
+
+def order_event(order_id, user_id, status, delivery_crew_id, changed, previous_delivery_crew_id=None):
+    event = {
+        'order': order_id,
+        'user': user_id,
+        'status': status,
+        'delivery_crew': delivery_crew_id,
+        'changed': changed,
+    }
+    if previous_delivery_crew_id is not None:
+        event['previous_delivery_crew'] = previous_delivery_crew_id
+    return event
+
+def publish_on_commit(*events):
+    """Publish events once the surrounding transaction commits."""
+    if events:
+        transaction.on_commit(lambda: [broker.publish(event) for event in events])
+
+def format_sse(event):
+    return f"event: order\ndata: {json.dumps(event)}\n\n"
+
+async def stream_order_events(user_id, load_roles, heartbeat=15):
+    """
+    Yield Server-Sent Events for one client until it disconnects, with a
+    comment line every `heartbeat` seconds to keep idle connections open.
+
+    Roles come from the `load_roles` coroutine function and are read again
+    on every heartbeat and whenever the broker reports they changed, so
+    revoked roles stop receiving other users' orders.
+    """
+    subscription = broker.subscribe(user_id, await load_roles())
+    try:
+        yield ": connected\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                subscription.roles = await load_roles()
+                yield ": keep-alive\n\n"
+                continue
+            if event is ROLES_CHANGED:
+                subscription.roles = await load_roles()
+            # Events queued before a role change are scoped again
+            elif subscription.wants(event):
+                yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,82 @@
+from rest_framework.permissions import SAFE_METHODS
+
+def parse_paths(value):
+    if value is None:
+        return None
+    return {path.strip() for path in value.split(',') if path.strip()}
+
+def nested_paths(paths, name):
+    prefix = f'{name}.'
+    return {path[len(prefix):] for path in paths if path.startswith(prefix)}
+
+class FieldSpec:
+    """
+    The ?fields= and ?expand= paths a client asked for, as dotted names
+    relative to one serializer.
+
+    With neither parameter the spec is the default: every field, every
+    relation nested. Otherwise only listed fields are returned (all of them
+    if ?fields= is absent) and relations are returned as ids unless listed
+    in ?expand=.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request):
+        # Only reads are shaped; writes always validate and return full objects
+        if request is None or request.method not in SAFE_METHODS:
+            return cls()
+        spec = getattr(request, '_field_spec', None)
+        if spec is None:
+            # Plain Django requests (e.g. from template views) carry GET only
+            params = getattr(request, 'query_params', request.GET)
+            fields = parse_paths(params.get('fields'))
+            expand = parse_paths(params.get('expand'))
+            if fields is None and expand is None:
+                spec = cls()
+            else:
+                spec = cls(fields, expand or set())
+            request._field_spec = spec
+        return spec
+
+    @property
+    def is_default(self):
+        return self.fields is None and self.expand is None
+
+    def includes(self, name):
+        if self.fields is None:
+            return True
+        return name in self.fields or bool(nested_paths(self.fields, name))
+
+    def expands(self, name):
+        if self.expand is None:
+            return True
+        return name in self.expand or bool(nested_paths(self.expand, name))
+
+    def sub(self, name):
+        """The spec for the serializer nested under `name`."""
+        if self.is_default:
+            return self
+        fields = None
+        if self.fields is not None and name not in self.fields:
+            fields = nested_paths(self.fields, name)
+        return FieldSpec(fields, nested_paths(self.expand, name))
+
+    def apply(self, data, expandable=()):
+        """
+        Shape already-serialized default output (e.g. a menu snapshot record)
+        the same way a serializer would under this spec.
+        """
+        if self.is_default:
+            return data
+        shaped = {}
+        for name, value in data.items():
+            if not self.includes(name):
+                continue
+            if name in expandable and isinstance(value, dict):
+                value = self.sub(name).apply(value) if self.expands(name) else value['id']
+            shaped[name] = value
+        return shaped
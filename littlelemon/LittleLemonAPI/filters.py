@@ -0,0 +1,111 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import F
+from django.db.models.functions import Lower
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Category
+
+class MenuItemFilter:
+    """
+    Declarative filters and orderings for menu item lists.
+    
+    Query parameters:
+        category   category id, slug or name
+        featured   true to list featured items only
+        min_price, max_price
+        ordering   comma-separated price, name or created_at, '-' for descending
+    
+    Category and featured filters can be answered from menu snapshot records;
+    price ranges and orderings run on a queryset backed by the MenuItem
+    indexes. Both paths return the same rows for the filters they share.
+    """
+    ordering_fields = ('price', 'name', 'created_at')
+    
+    def __init__(self, query_params):
+        errors = {}
+        self.category = query_params.get('category') or None
+        self.featured = self.parse_bool(query_params.get('featured'))
+        self.min_price = self.parse_price(query_params, 'min_price', errors)
+        self.max_price = self.parse_price(query_params, 'max_price', errors)
+        self.ordering = self.parse_ordering(query_params.get('ordering'), errors)
+        if errors:
+            raise serializers.ValidationError(errors)
+    
+    @staticmethod
+    def parse_bool(value):
+        return True if value and value.lower() in ('true', '1', 'yes') else None
+    
+    @staticmethod
+    def parse_price(query_params, name, errors):
+        value = query_params.get(name)
+        if not value:
+            return None
+        try:
+            price = Decimal(value)
+        except InvalidOperation:
+            price = None
+        if price is None or not price.is_finite():
+            errors[name] = ['A valid number is required.']
+            return None
+        return price
+    
+    def parse_ordering(self, value, errors):
+        ordering = []
+        for term in filter(None, (value or '').split(',')):
+            field = term.lstrip('-')
+            if field not in self.ordering_fields:
+                errors['ordering'] = [f"Order by one of: {', '.join(self.ordering_fields)}."]
+                return []
+            ordering.append((field, term.startswith('-')))
+        return ordering
+    
+    def filter_queryset(self, queryset):
+        if self.category:
+            # Resolve to an id once so the item filter can use the category indexes
+            if self.category.isdigit():
+                category_id = int(self.category)
+            else:
+                category_id = (
+                    Category.objects.filter(slug=self.category).values_list('pk', flat=True).first()
+                    or Category.objects.filter(name__iexact=self.category).values_list('pk', flat=True).first()
+                )
+            if category_id is None:
+                return queryset.none()
+            queryset = queryset.filter(category_id=category_id)
+        if self.featured is not None:
+            queryset = queryset.filter(is_featured=self.featured)
+        if self.min_price is not None:
+            queryset = queryset.filter(price__gte=self.min_price)
+        if self.max_price is not None:
+            queryset = queryset.filter(price__lte=self.max_price)
+        
+        order_by = []
+        for field, descending in self.ordering:
+            # Names sort case-insensitively whatever the column collation
+            expression = Lower(field) if field == 'name' else F(field)
+            order_by.append(expression.desc() if descending else expression.asc())
+        return queryset.order_by(*order_by, 'id')
+    
+    @property
+    def served_by_snapshot(self):
+        """
+        Whether the menu snapshot's prebuilt category and featured indexes
+        answer this filter. Price ranges and orderings need the database,
+        where the MenuItem indexes serve them.
+        """
+        return self.min_price is None and self.max_price is None and not self.ordering
+    
+    def filter_records(self, snapshot):
+        """Snapshot records for a filter that served_by_snapshot, in id order."""
+        category_id = None
+        if self.category:
+            category_id = snapshot.resolve_category(self.category)
+            if category_id is None:
+                return []
+        return snapshot.select(category_id=category_id, featured=self.featured)
+
+class MenuItemFilterBackend(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        return MenuItemFilter(request.query_params).filter_queryset(queryset)
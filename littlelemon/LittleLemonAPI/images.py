@@ -0,0 +1,186 @@
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, models, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Variant name and the width it is scaled down to; smaller uploads are never upscaled
+VARIANT_WIDTHS = (
+    ('thumb', 160),
+    ('card', 480),
+    ('full', 1200),
+)
+
+# Output key, file extension, Pillow format and save options
+VARIANT_FORMATS = (
+    ('webp', 'webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """The process-wide pool variants are generated in, created on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_VARIANT_WORKERS,
+                    thread_name_prefix='image-variants'
+                )
+    return _executor
+
+def variant_name(name, variant, extension):
+    """menu_images/pizza.png -> variants/menu_images/pizza/card.webp"""
+    stem = posixpath.splitext(name)[0]
+    return f'variants/{stem}/{variant}.{extension}'
+
+def flatten(image):
+    """RGB copy of image with any transparency composited onto white, for JPEG."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+def render_variants(field_file):
+    """
+    Write every size and format of an uploaded image to its storage and
+    return the stored names, by variant, as kept in image_variants.
+    """
+    storage = field_file.storage
+    with field_file.open('rb') as source, Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if image.mode in ('LA', 'P') else 'RGB')
+
+    variants = {}
+    for variant, width in VARIANT_WIDTHS:
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        else:
+            resized = image
+        variants[variant] = {'width': resized.width, 'height': resized.height}
+        for key, extension, image_format, options in VARIANT_FORMATS:
+            output = resized if image_format != 'JPEG' else flatten(resized)
+            buffer = io.BytesIO()
+            output.save(buffer, image_format, **options)
+            name = variant_name(field_file.name, variant, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            variants[variant][key] = storage.save(name, ContentFile(buffer.getvalue()))
+    return variants
+
+def generate_image_variants(model_label, pk, name):
+    """
+    Build variants for one item's image and record them, unless the item has
+    since been deleted or given a different image.
+    """
+    model = apps.get_model(model_label)
+    try:
+        instance = model._default_manager.get(pk=pk)
+        if instance.image.name != name:
+            return
+        variants = render_variants(instance.image)
+        with transaction.atomic():
+            # Check again under lock: the image may have been replaced while rendering
+            instance = model._default_manager.select_for_update().get(pk=pk)
+            if instance.image.name != name:
+                return
+            instance.image_variants = variants
+            instance.save(update_fields=['image_variants'])
+    except model.DoesNotExist:
+        pass
+    except Exception:
+        logger.exception('Could not generate image variants for %s %s', model_label, pk)
+
+def run_in_pool(model_label, pk, name):
+    try:
+        generate_image_variants(model_label, pk, name)
+    finally:
+        close_old_connections()
+
+def schedule_image_variants(instance):
+    """
+    Generate variants once the surrounding transaction commits: in the
+    worker pool, or inline when IMAGE_VARIANT_WORKERS is 0.
+    """
+    args = (instance._meta.label, instance.pk, instance.image.name)
+    if settings.IMAGE_VARIANT_WORKERS:
+        transaction.on_commit(lambda: get_executor().submit(run_in_pool, *args))
+    else:
+        transaction.on_commit(lambda: generate_image_variants(*args))
+
+def variant_urls(variants, request=None):
+    """Stored variant names as (absolute, given a request) URLs."""
+    urls = {}
+    for variant, entry in variants.items():
+        urls[variant] = {'width': entry['width'], 'height': entry['height']}
+        for key, _, _, _ in VARIANT_FORMATS:
+            url = default_storage.url(entry[key])
+            urls[variant][key] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+class ImageVariantsMixin(models.Model):
+    """
+    Keeps resized WebP and JPEG copies of the model's `image` upload in
+    image_variants. Saving a new image clears them and queues a rebuild.
+    """
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        image = instance.__dict__.get('image')
+        instance._loaded_image = getattr(image, 'name', image)
+        return instance
+
+    def image_changed(self):
+        return self.image.name != getattr(self, '_loaded_image', None)
+
+    def save(self, *args, **kwargs):
+        changed = self.image_changed()
+        if changed:
+            self.image_variants = {}
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'image' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'image_variants'}
+        super().save(*args, **kwargs)
+        self._loaded_image = self.image.name
+        if changed and self.image:
+            schedule_image_variants(self)
+
+    def image_srcset(self, key):
+        # Small uploads give variants of equal width; list each width once
+        candidates = {}
+        for entry in self.image_variants.values():
+            candidates.setdefault(entry['width'], self.image.storage.url(entry[key]))
+        return ', '.join(f'{url} {width}w' for width, url in candidates.items())
+
+    @property
+    def image_sources(self):
+        """srcset strings per format plus a fallback src, for <picture> markup."""
+        if not self.image_variants:
+            return None
+        return {
+            'webp': self.image_srcset('webp'),
+            'jpeg': self.image_srcset('jpeg'),
+            'src': self.image.storage.url(self.image_variants['card']['jpeg']),
+        }
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.archive import archive_closed_orders
+
+class Command(BaseCommand):
+    help = 'Moves delivered and cancelled orders older than N days into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help='Archive closed orders created more than this many days ago (default: 90)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of orders to move per transaction (default: 500)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many orders would be archived without moving them'
+        )
+
+    def handle(self, *args, **options):
+        count = archive_closed_orders(
+            days=options['days'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run']
+        )
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {count} orders'))
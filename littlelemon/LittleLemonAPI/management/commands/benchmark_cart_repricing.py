@@ -0,0 +1,102 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from LittleLemonAPI.models import Cart, Category, MenuItem
+from LittleLemonAPI.signals import menu_items_bulk_changed
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = (
+        'Times cart repricing after a single menu price change and after a bulk '
+        'price edit. Benchmark rows are created in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines',
+            type=int,
+            default=100000,
+            help='Open cart lines to seed (default: 100000)'
+        )
+        parser.add_argument(
+            '--items',
+            type=int,
+            default=100,
+            help='Menu items the lines are spread over (default: 100)'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            menu_items = self.seed(options['lines'], options['items'])
+            self.stdout.write(f'{Cart.objects.count()} open cart lines over {len(menu_items)} menu items')
+
+            item = menu_items[0]
+            item.price += Decimal('1.00')
+            self.measure('single price change', item.save, Cart.objects.filter(menu_item=item).count())
+
+            for menu_item in menu_items:
+                menu_item.price += Decimal('1.00')
+            MenuItem.objects.bulk_update(menu_items, ['price'])
+            self.measure(
+                'bulk price edit',
+                lambda: menu_items_bulk_changed.send(sender=MenuItem, item_ids=[item.pk for item in menu_items]),
+                options['lines']
+            )
+
+            stale = Cart.objects.exclude(unit_price__in=[item.price for item in menu_items]).count()
+            if stale:
+                self.stdout.write(self.style.ERROR(f'  {stale} cart lines were not repriced'))
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished; benchmark rows rolled back'))
+
+    def measure(self, label, func, lines):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            func()
+            seconds = time.perf_counter() - start
+        updates = [query for query in queries if query['sql'].startswith(f'UPDATE "{Cart._meta.db_table}"')]
+        self.stdout.write(
+            f'{label:<20} {lines:>7} lines  {seconds * 1000:>8.1f} ms total, '
+            f'{len(updates)} cart UPDATE taking {sum(float(query["time"]) for query in updates) * 1000:.1f} ms '
+            f'({len(queries)} queries including other listeners)'
+        )
+
+    def seed(self, lines, items):
+        category = Category.objects.create(name='Benchmark', slug='benchmark-cart-repricing')
+        menu_items = MenuItem.objects.bulk_create([
+            MenuItem(
+                name=f'Benchmark dish {i}',
+                description='Benchmark dish',
+                price=Decimal('9.50'),
+                category=category
+            )
+            for i in range(items)
+        ])
+        if any(item.pk is None for item in menu_items):
+            menu_items = list(MenuItem.objects.filter(category=category).order_by('pk'))
+        users = User.objects.bulk_create([
+            User(username=f'benchmark-cart-{i}', email=f'benchmark-cart-{i}@example.com')
+            for i in range(-(-lines // items))
+        ])
+        if any(user.pk is None for user in users):
+            users = list(User.objects.filter(username__startswith='benchmark-cart-').order_by('pk'))
+        Cart.objects.bulk_create(
+            (
+                Cart(
+                    user=users[i // items],
+                    menu_item=menu_items[i % items],
+                    quantity=2,
+                    unit_price=Decimal('9.50'),
+                    price=Decimal('19.00')
+                )
+                for i in range(lines)
+            ),
+            batch_size=5000
+        )
+        return menu_items
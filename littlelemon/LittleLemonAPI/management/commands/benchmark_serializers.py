@@ -0,0 +1,132 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from LittleLemonAPI.compiled import compile_serializer
+from LittleLemonAPI.models import Category, MenuItem, Order, OrderItem
+from LittleLemonAPI.serializers import MenuItemSerializer, OrderSerializer
+from restaurant.models import Booking
+from restaurant.serializers import BookingSerializer
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = (
+        'Compares rows per second of the DRF serializers and the compiled '
+        'read-only path on menu items, orders and bookings. Benchmark rows are '
+        'created in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=2000,
+            help='Number of rows of each kind to serialize (default: 2000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Best of this many runs per path (default: 3)'
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        request = Request(APIRequestFactory().get('/'))
+        context = {'request': request}
+
+        with transaction.atomic():
+            self.seed(rows)
+            cases = [
+                ('menu items', MenuItemSerializer, MenuItem.objects.order_by('id')),
+                ('orders', OrderSerializer, Order.objects.order_by('-created_at', '-id')),
+                ('bookings', BookingSerializer, Booking.objects.order_by('reservation_date', 'reservation_slot')),
+            ]
+            for label, serializer_class, queryset in cases:
+                def drf():
+                    if hasattr(serializer_class, 'setup_eager_loading'):
+                        objects = serializer_class.setup_eager_loading(queryset)
+                    else:
+                        objects = queryset
+                    return serializer_class(objects, many=True, context=context).data
+
+                def compiled():
+                    compiled = compile_serializer(serializer_class, context)
+                    return compiled.render(compiled.values(queryset))
+
+                drf_seconds, drf_data = self.best_of(drf, repeat)
+                compiled_seconds, compiled_data = self.best_of(compiled, repeat)
+                count = len(drf_data)
+                same = [dict(row) for row in drf_data] == compiled_data
+                self.stdout.write(
+                    f'{label:<11} {count:>7} rows  '
+                    f'drf {count / drf_seconds:>10.0f} rows/s  '
+                    f'compiled {count / compiled_seconds:>10.0f} rows/s  '
+                    f'x{drf_seconds / compiled_seconds:.1f}'
+                )
+                if not same:
+                    self.stdout.write(self.style.ERROR(f'  compiled output differs for {label}'))
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished; benchmark rows rolled back'))
+
+    def best_of(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = func()
+            seconds = time.perf_counter() - start
+            if best is None or seconds < best:
+                best = seconds
+        return best, data
+
+    def seed(self, rows):
+        category = Category.objects.create(name='Benchmark', slug='benchmark-serializers')
+        menu_items = MenuItem.objects.bulk_create([
+            MenuItem(
+                name=f'Benchmark dish {i}',
+                description='Benchmark dish',
+                price=Decimal('9.50'),
+                image='menu_images/benchmark.jpg',
+                category=category,
+                is_featured=i % 2 == 0
+            )
+            for i in range(rows)
+        ])
+        user = User.objects.create_user(
+            username='benchmark-serializers',
+            email='benchmark-serializers@example.com'
+        )
+        orders = Order.objects.bulk_create([
+            Order(user=user, delivery_crew=user if i % 2 else None, total=Decimal('28.50'))
+            for i in range(rows)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                menu_item=menu_items[(i + j) % len(menu_items)],
+                quantity=1,
+                unit_price=Decimal('9.50'),
+                price=Decimal('9.50')
+            )
+            for i, order in enumerate(orders)
+            for j in range(3)
+        ])
+        # Book every slot from far in the future so existing bookings don't collide
+        slots = [value for value, _ in Booking.TIME_SLOTS]
+        start = date(2999, 1, 1)
+        Booking.objects.bulk_create([
+            Booking(
+                first_name=f'Guest {i}',
+                reservation_date=start + timedelta(days=i // len(slots)),
+                reservation_slot=slots[i % len(slots)]
+            )
+            for i in range(rows)
+        ])
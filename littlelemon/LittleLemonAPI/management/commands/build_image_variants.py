@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.images import generate_image_variants, run_in_pool
+from LittleLemonAPI.models import MenuItem as ApiMenuItem
+from menu.models import MenuItem as SiteMenuItem
+
+class Command(BaseCommand):
+    help = 'Generates resized image variants for menu items that have none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Regenerate variants for every menu item with an image'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.IMAGE_VARIANT_WORKERS,
+            help='Threads to resize images in; 0 runs inline (default: IMAGE_VARIANT_WORKERS)'
+        )
+
+    def handle(self, *args, **options):
+        jobs = []
+        for model in (ApiMenuItem, SiteMenuItem):
+            queryset = model.objects.exclude(image='')
+            if not options['all']:
+                queryset = queryset.filter(image_variants={})
+            jobs += [
+                (model._meta.label, pk, name)
+                for pk, name in queryset.values_list('pk', 'image')
+            ]
+
+        if options['workers']:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                list(pool.map(lambda job: run_in_pool(*job), jobs))
+        else:
+            for job in jobs:
+                generate_image_variants(*job)
+
+        self.stdout.write(self.style.SUCCESS(f'Generated image variants for {len(jobs)} menu items'))
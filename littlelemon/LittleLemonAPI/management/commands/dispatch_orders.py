@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.dispatch import dispatch_pending_orders
+
+class Command(BaseCommand):
+    help = 'Assigns pending orders to delivery crew members by current open-order load'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of orders to claim per transaction (default: 500)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Maximum number of orders to assign in this run'
+        )
+
+    def handle(self, *args, **options):
+        assigned = dispatch_pending_orders(
+            batch_size=options['batch_size'],
+            limit=options['limit']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Assigned {sum(assigned.values())} orders to {len(assigned)} delivery crew members'
+        ))
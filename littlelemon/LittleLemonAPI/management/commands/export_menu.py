@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.catalog_io import FORMATS, export_menu, format_from_name
+
+class Command(BaseCommand):
+    help = 'Writes every menu item to a CSV or JSONL file that import_menu can read back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Output file (default: stdout)')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='File format (default: from the file extension, else csv)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or format_from_name(path)
+        if path == '-':
+            for line in export_menu(file_format):
+                self.stdout.write(line, ending='')
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as stream:
+            stream.writelines(export_menu(file_format))
+        self.stderr.write(self.style.SUCCESS(f'Exported menu items to {path}'))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.carts import get_cart_backend
+
+class Command(BaseCommand):
+    help = 'Writes carts changed in the cache since the last run to the Cart table'
+
+    def handle(self, *args, **options):
+        flushed = get_cart_backend().flush()
+        self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} carts'))
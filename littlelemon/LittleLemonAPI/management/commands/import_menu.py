@@ -0,0 +1,37 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from LittleLemonAPI.catalog_io import FORMATS, format_from_name, import_menu
+
+class Command(BaseCommand):
+    help = 'Creates or updates menu items from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file, as written by export_menu')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='File format (default: from the file extension, else csv)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows to upsert per transaction (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or format_from_name(options['path'])
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                report = import_menu(stream, file_format, batch_size=options['batch_size'])
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+
+        for error in report['errors']:
+            self.stderr.write(f'Row {error["row"]}: {error["errors"]}')
+        style = self.style.SUCCESS if not report['errors'] else self.style.WARNING
+        self.stdout.write(style(
+            f'Created {report["created"]} and updated {report["updated"]} menu items; '
+            f'{len(report["errors"])} rows rejected'
+        ))
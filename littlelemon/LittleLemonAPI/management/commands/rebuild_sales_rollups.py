@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.reports import rebuild_sales_rollups
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily sales rollup tables from live and archived orders'
+
+    def handle(self, *args, **options):
+        item_rows, category_rows = rebuild_sales_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {item_rows} menu item and {category_rows} category daily sales rows'
+        ))
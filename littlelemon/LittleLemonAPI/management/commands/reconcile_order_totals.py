@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from LittleLemonAPI.models import Order, OrderItem
+
+class Command(BaseCommand):
+    help = 'Repairs Order.total values that have drifted from the sum of their items'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of orders to check per transaction (default: 1000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drifted orders without fixing them'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+
+        # Lines removed by menu item deletes still count towards what was charged
+        items_total = Coalesce(
+            Subquery(
+                OrderItem.objects.filter(order=OuterRef('pk'))
+                .values('order')
+                .annotate(total=Sum('price'))
+                .values('total')
+            ),
+            Value(0),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        ) + F('removed_total')
+
+        checked = repaired = 0
+        last_id = 0
+        while True:
+            # Walk the table by primary key so each chunk is an index range scan
+            ids = list(
+                Order.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+
+            with transaction.atomic():
+                drifted = list(
+                    Order.objects.filter(pk__gte=ids[0], pk__lte=last_id)
+                    .annotate(expected=items_total)
+                    .exclude(total=F('expected'))
+                    .values_list('pk', flat=True)
+                )
+                if drifted and not dry_run:
+                    Order.objects.filter(pk__in=drifted).update(total=items_total)
+            repaired += len(drifted)
+
+        verb = 'Found' if dry_run else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {repaired} drifted order totals out of {checked} orders'
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.carts import sweep_expired_carts
+
+class Command(BaseCommand):
+    help = 'Deletes cart lines left untouched for longer than CART_EXPIRY_DAYS, in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Delete lines not changed for this many days (default: CART_EXPIRY_DAYS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of lines to delete per transaction (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        stats = sweep_expired_carts(days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Reclaimed {stats['lines']} cart lines from {stats['carts']} carts "
+            f"in {stats['batches']} batches"
+        ))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:05
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0008_cart_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='menuitem',
+            name='menuitem_name_idx',
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='menuitem_name_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0009_menuitem_name_lower_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='removed_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+    ]
@@ -1,7 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.utils.translation import gettext_lazy as _
 
+from .images import ImageVariantsMixin
+
 class User(AbstractUser):
     email = models.EmailField(unique=True)
     groups = models.ManyToManyField(
@@ -38,7 +43,7 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
-class MenuItem(models.Model):
+class MenuItem(ImageVariantsMixin, models.Model):
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=6, decimal_places=2)
     description = models.TextField()
@@ -48,23 +53,76 @@ class MenuItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Menu list filters: category and/or featured, with price ranges and ordering
+            models.Index(fields=['category', 'is_featured', 'price'], name='menuitem_cat_featured_idx'),
+            models.Index(fields=['category', 'price'], name='menuitem_cat_price_idx'),
+            models.Index(fields=['is_featured', 'price'], name='menuitem_featured_price_idx'),
+            models.Index(fields=['price'], name='menuitem_price_idx'),
+            # Names order case-insensitively (see filters.MenuItemFilter)
+            models.Index(Lower('name'), name='menuitem_name_idx'),
+            models.Index(fields=['created_at'], name='menuitem_created_idx'),
+            # Newest change, for the catalog version
+            models.Index(fields=['updated_at'], name='menuitem_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded price so saves can tell whether carts need repricing
+        instance._loaded_price = instance.__dict__.get('price')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # post_save receivers have seen the old price by now
+        self._loaded_price = self.price
+
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     quantity = models.SmallIntegerField()
     unit_price = models.DecimalField(max_digits=6, decimal_places=2)
     price = models.DecimalField(max_digits=6, decimal_places=2)
+    # Last time the customer added or changed the line, for expiring abandoned carts
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('user', 'menu_item')
+        indexes = [
+            models.Index(fields=['updated_at'], name='cart_updated_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         self.price = self.unit_price * self.quantity
         super().save(*args, **kwargs)
 
+    @classmethod
+    def reprice(cls, menu_item_id, unit_price):
+        """Move every open cart line of one menu item to a new price in one UPDATE."""
+        return cls.objects.filter(menu_item_id=menu_item_id).exclude(unit_price=unit_price).update(
+            unit_price=unit_price,
+            price=F('quantity') * unit_price
+        )
+
+    @classmethod
+    def reprice_from_menu(cls, menu_item_ids):
+        """
+        Bring cart lines of many menu items to their current menu prices in
+        one UPDATE, touching only lines whose price is out of date.
+        """
+        current_price = Subquery(MenuItem.objects.filter(pk=OuterRef('menu_item_id')).values('price')[:1])
+        return (
+            cls.objects.filter(menu_item_id__in=menu_item_ids)
+            .alias(current_price=current_price)
+            .exclude(unit_price=F('current_price'))
+            .update(unit_price=current_price, price=F('quantity') * current_price)
+        )
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -82,13 +140,60 @@ class Order(models.Model):
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Price of lines removed by menu item deletes, still part of what was charged
+    removed_total = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
     date = models.DateField(auto_now_add=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Orders feed: newest first, optionally filtered by status or crew
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='order_status_created_idx'),
+            models.Index(fields=['delivery_crew', 'created_at', 'id'], name='order_crew_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} - {self.user.username} - {self.status}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so saves can tell which fields changed
+        instance._loaded_state = (
+            instance.__dict__.get('status'),
+            instance.__dict__.get('delivery_crew_id'),
+        )
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            # Totals are kept with F() updates; an instance loaded before its
+            # lines changed must not write its stale copies back
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('total', 'removed_total')
+            ]
+        super().save(*args, **kwargs)
+        # post_save receivers have seen the old state by now
+        self._loaded_state = (self.status, self.delivery_crew_id)
+
+    @classmethod
+    def adjust_total(cls, order_id, delta):
+        """Atomically add delta to an order's total in the database."""
+        if delta:
+            cls.objects.filter(pk=order_id).update(
+                total=F('total') + delta,
+                updated_at=timezone.now()
+            )
+
+    @classmethod
+    def record_removed_lines(cls, order_id, amount):
+        """Note lines that left an order without changing what it cost."""
+        if amount:
+            cls.objects.filter(pk=order_id).update(removed_total=F('removed_total') + amount)
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -101,8 +206,89 @@ class OrderItem(models.Model):
 
     def save(self, *args, **kwargs):
         self.price = self.unit_price * self.quantity
-        super().save(*args, **kwargs)
-        # Update order total
-        order = self.order
-        order.total = sum(item.price for item in order.items.all())
-        order.save()
+        with transaction.atomic():
+            # Lock the stored line so concurrent edits see each other's deltas
+            previous = None
+            if self.pk:
+                previous = (
+                    OrderItem.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values('order_id', 'price')
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            # Update order total by the change in this line only
+            if previous is None:
+                Order.adjust_total(self.order_id, self.price)
+            elif previous['order_id'] != self.order_id:
+                Order.adjust_total(previous['order_id'], -previous['price'])
+                Order.adjust_total(self.order_id, self.price)
+            else:
+                Order.adjust_total(self.order_id, self.price - previous['price'])
+
+class ArchivedOrder(models.Model):
+    """Closed order moved out of the live Order table. Keeps the original id."""
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    delivery_crew = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='archived_delivery_crew_orders'
+    )
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    date = models.DateField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='archived_order_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.id} - {self.status}"
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    # Menu items can be deleted long after an order closes, so keep the name too
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.SET_NULL, null=True)
+    menu_item_name = models.CharField(max_length=100)
+    quantity = models.SmallIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+
+class MenuItemDailySales(models.Model):
+    """Units sold and revenue per menu item per order date, excluding cancelled orders."""
+    date = models.DateField()
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'menu_item')
+
+class CategoryDailySales(models.Model):
+    """Units sold and revenue per category per order date, excluding cancelled orders."""
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'category')
+        verbose_name_plural = 'Category daily sales'
+
+class CatalogVersion(models.Model):
+    """
+    Single-row change counter for the menu catalog. Bumped on every save and
+    delete of a Category or MenuItem so clients can revalidate cheaply.
+    """
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Catalog version {self.version}"
@@ -0,0 +1,10 @@
+from rest_framework.pagination import CursorPagination
+
+class OrderCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the orders feed. Each page seeks from the last
+    (created_at, id) seen instead of counting and offsetting.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,15 @@
+from rest_framework.permissions import BasePermission
+
+from .roles import MANAGER, DELIVERY_CREW, has_role
+
+class IsManager(BasePermission):
+    """Allows access only to members of the Manager group."""
+    
+    def has_permission(self, request, view):
+        return has_role(request.user, MANAGER)
+
+class IsDeliveryCrew(BasePermission):
+    """Allows access only to members of the Delivery Crew group."""
+    
+    def has_permission(self, request, view):
+        return has_role(request.user, DELIVERY_CREW)
@@ -0,0 +1,130 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import (
+    OrderItem, ArchivedOrderItem, MenuItemDailySales, CategoryDailySales,
+)
+
+ROLLUP_FIELDS = ['order__date', 'menu_item_id', 'menu_item__category_id']
+
+_keep_deleted_sales = ContextVar('keep_deleted_sales', default=False)
+
+@contextmanager
+def keep_deleted_order_sales():
+    """
+    Orders deleted inside this block stay in the rollups, for deletes that
+    move orders elsewhere (the archive) rather than discard them.
+    """
+    token = _keep_deleted_sales.set(True)
+    try:
+        yield
+    finally:
+        _keep_deleted_sales.reset(token)
+
+def deleted_order_sales_kept():
+    return _keep_deleted_sales.get()
+
+def _empty_totals():
+    return [0, Decimal('0')]
+
+def _collect(rows, item_totals, category_totals, sign=1):
+    for row in rows:
+        date = row['order__date']
+        quantity = sign * (row['quantity'] or 0)
+        revenue = sign * (row['revenue'] or Decimal('0'))
+        for totals, key in (
+            (item_totals, (date, row['menu_item_id'])),
+            (category_totals, (date, row['menu_item__category_id'])),
+        ):
+            totals[key][0] += quantity
+            totals[key][1] += revenue
+
+def _grouped(queryset):
+    return (
+        queryset.values(*ROLLUP_FIELDS)
+        .annotate(quantity=Sum('quantity'), revenue=Sum('price'))
+        .order_by()
+    )
+
+def _apply(model, key_field, deltas):
+    """Add {(date, key id): [quantity, revenue]} deltas to a rollup table."""
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    # Make sure every row exists, then lock and bump them all at once
+    model.objects.bulk_create(
+        [model(date=date, **{f'{key_field}_id': key}) for date, key in deltas],
+        ignore_conflicts=True
+    )
+    rows = list(model.objects.select_for_update().filter(
+        date__in={date for date, _ in deltas},
+        **{f'{key_field}_id__in': {key for _, key in deltas}}
+    ))
+    changed = []
+    for row in rows:
+        delta = deltas.get((row.date, getattr(row, f'{key_field}_id')))
+        if delta:
+            row.quantity += delta[0]
+            row.revenue += delta[1]
+            changed.append(row)
+    model.objects.bulk_update(changed, ['quantity', 'revenue'])
+
+def apply_order_sales(order_ids, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) the given orders' lines from the daily
+    rollups. Costs a fixed number of queries however many orders and lines.
+    """
+    if not order_ids:
+        return
+    item_totals = defaultdict(_empty_totals)
+    category_totals = defaultdict(_empty_totals)
+    with transaction.atomic():
+        _collect(
+            _grouped(OrderItem.objects.filter(order_id__in=order_ids)),
+            item_totals, category_totals, sign
+        )
+        _apply(MenuItemDailySales, 'menu_item', item_totals)
+        _apply(CategoryDailySales, 'category', category_totals)
+
+def rebuild_sales_rollups():
+    """
+    Recompute both rollup tables from live and archived orders.
+    Returns (menu item rows, category rows).
+    """
+    item_totals = defaultdict(_empty_totals)
+    category_totals = defaultdict(_empty_totals)
+    with transaction.atomic():
+        _collect(
+            _grouped(OrderItem.objects.exclude(order__status='cancelled')).iterator(),
+            item_totals, category_totals
+        )
+        _collect(
+            _grouped(
+                ArchivedOrderItem.objects.exclude(order__status='cancelled')
+                .filter(menu_item__isnull=False)
+            ).iterator(),
+            item_totals, category_totals
+        )
+        
+        MenuItemDailySales.objects.all().delete()
+        CategoryDailySales.objects.all().delete()
+        MenuItemDailySales.objects.bulk_create(
+            [
+                MenuItemDailySales(date=date, menu_item_id=key, quantity=quantity, revenue=revenue)
+                for (date, key), (quantity, revenue) in item_totals.items()
+            ],
+            batch_size=1000
+        )
+        CategoryDailySales.objects.bulk_create(
+            [
+                CategoryDailySales(date=date, category_id=key, quantity=quantity, revenue=revenue)
+                for (date, key), (quantity, revenue) in category_totals.items()
+            ],
+            batch_size=1000
+        )
+    return len(item_totals), len(category_totals)
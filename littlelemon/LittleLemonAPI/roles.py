@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.dispatch import Signal
+
+MANAGER = 'Manager'
+DELIVERY_CREW = 'Delivery Crew'
+CUSTOMER = 'Customer'
+
+ROLE_CACHE_KEY = 'littlelemon:roles:{}'
+
+# Sent with user_ids once a group change that invalidated their roles commits
+roles_changed = Signal()
+# Most seconds roles are cached in a per-process cache, which group changes
+# in other processes can't invalidate
+LOCAL_ROLE_CACHE_TIMEOUT = 5
+
+def role_cache_timeout():
+    """
+    ROLE_CACHE_TIMEOUT when the default cache is shared by every process,
+    otherwise no more than LOCAL_ROLE_CACHE_TIMEOUT, so a revoked role stops
+    working everywhere within seconds.
+    """
+    if isinstance(caches['default'], (LocMemCache, DummyCache)):
+        return min(settings.ROLE_CACHE_TIMEOUT, LOCAL_ROLE_CACHE_TIMEOUT)
+    return settings.ROLE_CACHE_TIMEOUT
+
+def get_user_roles(user):
+    """
+    Return the set of group names a user belongs to.
+    
+    The set is memoized on the user object for the rest of the request and
+    cached across requests until the user's groups change, for at most
+    role_cache_timeout() seconds.
+    """
+    if not user or not user.is_authenticated:
+        return frozenset()
+    
+    roles = getattr(user, '_littlelemon_roles', None)
+    if roles is None:
+        key = ROLE_CACHE_KEY.format(user.pk)
+        roles = cache.get(key)
+        if roles is None:
+            roles = frozenset(user.groups.values_list('name', flat=True))
+            cache.set(key, roles, role_cache_timeout())
+        user._littlelemon_roles = roles
+    return roles
+
+def has_role(user, role):
+    return role in get_user_roles(user)
+
+def invalidate_user_roles(*user_ids):
+    """Drop cached role sets for the given users."""
+    keys = [ROLE_CACHE_KEY.format(user_id) for user_id in user_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # Delete again once the group change commits, in case a concurrent
+    # request re-cached the old roles in between
+    def committed():
+        cache.delete_many(keys)
+        roles_changed.send(sender=None, user_ids=user_ids)
+    transaction.on_commit(committed)
@@ -0,0 +1,112 @@
+import bisect
+import math
+import re
+import unicodedata
+from collections import defaultdict
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# How much a hit in each field counts towards an item's score
+FIELD_WEIGHTS = (
+    ('name', 3.0),
+    ('category', 2.0),
+    ('description', 1.0),
+)
+
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.7
+TYPO_MATCH = 0.4
+
+def tokenize(text):
+    """Lowercase, strip accents and split text into alphanumeric tokens."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = text.encode('ascii', 'ignore').decode('ascii').lower()
+    return TOKEN_RE.findall(text)
+
+def deletes(token):
+    """All strings one deletion away from token."""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+class MenuSearchIndex:
+    """
+    Inverted index over menu item records for ranked search.
+
+    Query tokens match indexed terms exactly, as a prefix, or within one
+    typo (insert, delete or substitute). Typos are looked up through a
+    deletion index, so search cost depends on the query rather than on the
+    number of items.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        # term -> {record position: weighted term frequency}
+        self.postings = defaultdict(lambda: defaultdict(float))
+        for position, record in enumerate(records):
+            fields = {
+                'name': record['name'],
+                'category': record['category']['name'],
+                'description': record['description'],
+            }
+            for field, weight in FIELD_WEIGHTS:
+                for term in tokenize(fields[field]):
+                    self.postings[term][position] += weight
+        self.postings = {term: dict(hits) for term, hits in self.postings.items()}
+        self.terms = sorted(self.postings)
+
+        self.typo_index = defaultdict(set)
+        for term in self.terms:
+            if len(term) > 3:
+                for variant in deletes(term):
+                    self.typo_index[variant].add(term)
+
+    def idf(self, term):
+        return math.log(1 + len(self.records) / len(self.postings[term]))
+
+    def expand(self, token):
+        """Indexed terms a query token may refer to, with how well each matches."""
+        matches = {}
+        start = bisect.bisect_left(self.terms, token)
+        for term in self.terms[start:]:
+            if not term.startswith(token):
+                break
+            matches[term] = EXACT_MATCH if term == token else PREFIX_MATCH
+
+        if len(token) > 3:
+            candidates = set(self.typo_index.get(token, ()))
+            for variant in deletes(token) | {token}:
+                candidates.update(self.typo_index.get(variant, ()))
+                if variant in self.postings:
+                    candidates.add(variant)
+            for term in candidates:
+                matches.setdefault(term, TYPO_MATCH)
+        return matches
+
+    def search(self, query):
+        """
+        Return records matching every query token, best match first.
+        Ties keep catalog order.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        scores = None
+        for token in tokens:
+            token_scores = defaultdict(float)
+            for term, quality in self.expand(token).items():
+                idf = self.idf(term)
+                for position, frequency in self.postings[term].items():
+                    token_scores[position] = max(token_scores[position], quality * frequency * idf)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    position: score + token_scores[position]
+                    for position, score in scores.items()
+                    if position in token_scores
+                }
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda hit: (-hit[1], hit[0]))
+        return [self.records[position] for position, _ in ranked]
@@ -1,10 +1,87 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from django.db import transaction
+from django.db.models import Prefetch, Sum
+from .models import Category, MenuItem, Cart, Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+from .carts import get_cart_backend
+from .fieldsets import FieldSpec
+from .images import variant_urls
+from .reports import apply_order_sales
+from .roles import DELIVERY_CREW
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+class EagerLoadingMixin:
+    """
+    Declares the related rows a serializer reads so list and detail views
+    can load them up front instead of one query per object.
+    
+    Reads also honour ?fields= and ?expand= (see FieldSpec): relations that
+    were not asked for are neither serialized nor joined or prefetched.
+    """
+    # Foreign keys nested as objects, or returned as ids when not expanded
+    expandable_fields = []
+    # Reverse relations nested through a many=True serializer
+    prefetch_related_fields = []
+    
+    @classmethod
+    def nested_serializer_class(cls, name):
+        field = cls._declared_fields[name]
+        return type(getattr(field, 'child', field))
+    
+    @classmethod
+    def select_related_paths(cls, spec):
+        paths = []
+        for name in cls.expandable_fields:
+            if spec.includes(name) and spec.expands(name):
+                paths.append(name)
+                nested = cls.nested_serializer_class(name)
+                if hasattr(nested, 'select_related_paths'):
+                    paths += [f'{name}__{path}' for path in nested.select_related_paths(spec.sub(name))]
+        return paths
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset, spec=None):
+        spec = spec or FieldSpec()
+        paths = cls.select_related_paths(spec)
+        if paths:
+            queryset = queryset.select_related(*paths)
+        for name in cls.prefetch_related_fields:
+            if spec.includes(name):
+                nested = cls.nested_serializer_class(name)
+                queryset = queryset.prefetch_related(Prefetch(
+                    name,
+                    queryset=nested.setup_eager_loading(nested.Meta.model.objects.all(), spec.sub(name))
+                ))
+        return queryset
+    
+    def get_field_spec(self):
+        path = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        spec = FieldSpec.from_request(self.context.get('request'))
+        for name in reversed(path):
+            spec = spec.sub(name)
+        return spec
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        spec = self.get_field_spec()
+        if spec.is_default:
+            return fields
+        for name, field in list(fields.items()):
+            if field.write_only:
+                continue
+            if not spec.includes(name):
+                del fields[name]
+            elif name in self.expandable_fields and not spec.expands(name):
+                fields[name] = serializers.IntegerField(source=f'{name}_id', read_only=True)
+        return fields
+
+class UserSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
@@ -31,58 +108,97 @@ class UserCreateSerializer(serializers.ModelSerializer):
         )
         return user
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'description']
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Resized image URLs by variant and format; empty until they have been generated."""
+    def to_representation(self, value):
+        return variant_urls(value, self.context.get('request'))
+
+class MenuItemSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.IntegerField(write_only=True)
+    image_variants = ImageVariantsField()
+    
+    expandable_fields = ['category']
     
     class Meta:
         model = MenuItem
-        fields = ['id', 'name', 'description', 'price', 'image', 'category', 'category_id', 
-                 'is_featured', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'description', 'price', 'image', 'image_variants', 'category',
+                 'category_id', 'is_featured', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
-class CartSerializer(serializers.ModelSerializer):
+class CartListSerializer(serializers.ListSerializer):
+    """
+    Adds many lines at once: prices come from one query and the cart backend
+    stores every line in one write.
+    """
+    def validate(self, attrs):
+        # A menu item listed twice keeps its last quantity
+        lines = list({line['menu_item_id']: line for line in attrs}.values())
+        prices = dict(
+            MenuItem.objects.filter(pk__in=[line['menu_item_id'] for line in lines])
+            .values_list('pk', 'price')
+        )
+        missing = sorted(line['menu_item_id'] for line in lines if line['menu_item_id'] not in prices)
+        if missing:
+            raise serializers.ValidationError({'menu_item_id': [f'No menu item with id {pk}.' for pk in missing]})
+        return [{**line, 'unit_price': prices[line['menu_item_id']]} for line in lines]
+    
+    def create(self, validated_data):
+        return get_cart_backend().add(
+            self.context['request'].user,
+            {line['menu_item_id']: (line['quantity'], line['unit_price']) for line in validated_data}
+        )
+
+class CartSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     menu_item = MenuItemSerializer(read_only=True)
     menu_item_id = serializers.IntegerField(write_only=True)
     
+    expandable_fields = ['menu_item']
+    
     class Meta:
         model = Cart
         fields = ['id', 'menu_item', 'menu_item_id', 'quantity', 'unit_price', 'price']
         read_only_fields = ['user', 'unit_price', 'price']
+        list_serializer_class = CartListSerializer
     
     def create(self, validated_data):
         menu_item_id = validated_data.pop('menu_item_id')
         menu_item = MenuItem.objects.get(id=menu_item_id)
         
-        cart, created = Cart.objects.update_or_create(
-            user=self.context['request'].user,
-            menu_item=menu_item,
-            defaults={
-                'quantity': validated_data.get('quantity', 1),
-                'unit_price': menu_item.price,
-                'price': menu_item.price * validated_data.get('quantity', 1)
-            }
+        [cart] = get_cart_backend().add(
+            self.context['request'].user,
+            {menu_item.pk: (validated_data.get('quantity', 1), menu_item.price)}
         )
         return cart
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class CartSummarySerializer(serializers.Serializer):
+    item_count = serializers.IntegerField()
+    subtotal = serializers.DecimalField(max_digits=10, decimal_places=2)
+    line_count = serializers.IntegerField()
+
+class OrderItemSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     menu_item = MenuItemSerializer(read_only=True)
     
+    expandable_fields = ['menu_item']
+    
     class Meta:
         model = OrderItem
         fields = ['id', 'menu_item', 'quantity', 'unit_price', 'price']
         read_only_fields = ['unit_price', 'price']
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     user = UserSerializer(read_only=True)
     delivery_crew = UserSerializer(read_only=True)
     
+    expandable_fields = ['user', 'delivery_crew']
+    prefetch_related_fields = ['items']
+    
     class Meta:
         model = Order
         fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'date', 
@@ -91,32 +207,105 @@ class OrderSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         user = self.context['request'].user
-        cart_items = Cart.objects.filter(user=user)
-        
-        if not cart_items.exists():
-            raise serializers.ValidationError("Your cart is empty")
         
-        # Calculate total
-        total = sum(item.price for item in cart_items)
-        
-        # Create order
-        order = Order.objects.create(
-            user=user,
-            total=total,
-            status='pending'
-        )
-        
-        # Create order items
-        for item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                menu_item=item.menu_item,
-                quantity=item.quantity,
-                unit_price=item.unit_price,
-                price=item.price
+        carts = get_cart_backend()
+        with transaction.atomic():
+            # Write-behind backends hold lines outside the Cart table until now
+            carts.persist(user)
+            # Lock the user's cart lines so concurrent checkouts can't double-order them
+            cart_items = list(Cart.objects.select_for_update().filter(user=user))
+            
+            if not cart_items:
+                raise serializers.ValidationError("Your cart is empty")
+            
+            # Calculate total
+            total = Cart.objects.filter(user=user).aggregate(total=Sum('price'))['total']
+            
+            # Create order
+            order = Order.objects.create(
+                user=user,
+                total=total,
+                status='pending'
             )
-        
-        # Clear the cart
-        cart_items.delete()
+            
+            # Create order items in a single insert
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    menu_item_id=item.menu_item_id,
+                    quantity=item.quantity,
+                    unit_price=item.unit_price,
+                    price=item.price
+                )
+                for item in cart_items
+            ])
+            apply_order_sales([order.pk])
+            
+            # Clear the cart
+            carts.clear(user)
         
         return order
+
+class ArchivedOrderItemSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedOrderItem
+        fields = ['id', 'menu_item', 'menu_item_name', 'quantity', 'unit_price', 'price']
+        read_only_fields = fields
+
+class ArchivedOrderSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
+    user = UserSerializer(read_only=True)
+    delivery_crew = UserSerializer(read_only=True)
+    
+    expandable_fields = ['user', 'delivery_crew']
+    prefetch_related_fields = ['items']
+    
+    class Meta:
+        model = ArchivedOrder
+        fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'date',
+                 'created_at', 'updated_at', 'archived_at', 'items']
+        read_only_fields = fields
+
+class OrderBulkUpdateSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500
+    )
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES, required=False)
+    delivery_crew = serializers.IntegerField(required=False, allow_null=True)
+    
+    def validate_ids(self, value):
+        # Keep request order but drop duplicates
+        return list(dict.fromkeys(value))
+    
+    def validate_delivery_crew(self, value):
+        if value is not None and not User.objects.filter(pk=value, groups__name=DELIVERY_CREW).exists():
+            raise serializers.ValidationError("No delivery crew member found with the given ID.")
+        return value
+    
+    def validate(self, data):
+        if 'status' not in data and 'delivery_crew' not in data:
+            raise serializers.ValidationError("Provide a status and/or delivery_crew to update.")
+        return data
+
+class MenuItemImportSerializer(serializers.Serializer):
+    """
+    One row of a catalog import. Rows with an id update that item; rows
+    without one update the item with the same name in the same category,
+    or create it. Optional columns left out of a row keep their current
+    values on update.
+    """
+    id = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    name = serializers.CharField(max_length=100)
+    description = serializers.CharField(required=False, allow_blank=True)
+    price = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=0)
+    category = serializers.CharField(max_length=100)
+    is_featured = serializers.BooleanField(required=False)
+    image = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+class SalesReportRowSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
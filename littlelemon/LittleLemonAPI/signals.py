@@ -1,10 +1,19 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import Signal, receiver
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 
+from .catalog import bump_catalog_version
+from .events import broker, order_event, publish_on_commit
+from .models import Cart, Category, MenuItem, Order, OrderItem
+from .reports import apply_order_sales, deleted_order_sales_kept
+from .roles import invalidate_user_roles, roles_changed
+
 User = get_user_model()
 
+# Sent with item_ids after bulk writes that bypass per-object save signals
+menu_items_bulk_changed = Signal()
+
 @receiver(post_save, sender=User)
 def add_default_group(sender, instance, created, **kwargs):
     """
@@ -18,3 +27,126 @@ def add_default_group(sender, instance, created, **kwargs):
             # Create the Customer group if it doesn't exist
             customer_group = Group.objects.create(name='Customer')
             instance.groups.add(customer_group)
+
+@receiver(post_delete, sender=OrderItem)
+def subtract_order_item_from_total(sender, instance, origin=None, **kwargs):
+    """
+    Take a deleted line's price off its order's total.
+    """
+    origin_model = getattr(origin, 'model', type(origin))
+    # Nothing to adjust when the order itself is being deleted
+    if origin_model is Order:
+        return
+    if origin_model is OrderItem:
+        Order.adjust_total(instance.order_id, -instance.price)
+    else:
+        # Lines cascaded from a deleted menu item keep what was charged; note
+        # them so reconcile_order_totals still adds up
+        Order.record_removed_lines(instance.order_id, instance.price)
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drop cached role sets when group membership changes from either side.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if not reverse:
+        instance.__dict__.pop('_littlelemon_roles', None)
+        invalidate_user_roles(instance.pk)
+    elif action == 'pre_clear':
+        invalidate_user_roles(*instance.littlelemon_user_set.values_list('pk', flat=True))
+    elif pk_set:
+        invalidate_user_roles(*pk_set)
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_roles_on_group_rename(sender, instance, **kwargs):
+    """
+    Renaming or deleting a group changes the role set of all its members.
+    """
+    if instance.pk:
+        invalidate_user_roles(*instance.littlelemon_user_set.values_list('pk', flat=True))
+
+@receiver(roles_changed)
+def narrow_order_streams_on_role_change(sender, user_ids, **kwargs):
+    """
+    Stop open order event streams from receiving orders under roles their
+    users have lost.
+    """
+    broker.roles_changed(user_ids)
+
+@receiver(post_save, sender=Order)
+def publish_order_change(sender, instance, created, **kwargs):
+    """
+    Push status and assignment changes to connected order event streams.
+    """
+    status, delivery_crew_id = getattr(instance, '_loaded_state', (None, None))
+    if created:
+        changed = ['created']
+    else:
+        changed = []
+        if instance.status != status:
+            changed.append('status')
+        if instance.delivery_crew_id != delivery_crew_id:
+            changed.append('delivery_crew')
+
+    if changed:
+        publish_on_commit(order_event(
+            instance.pk,
+            instance.user_id,
+            instance.status,
+            instance.delivery_crew_id,
+            changed,
+            previous_delivery_crew_id=delivery_crew_id if 'delivery_crew' in changed else None
+        ))
+
+@receiver(post_save, sender=Order)
+def update_sales_on_cancel(sender, instance, created, **kwargs):
+    """
+    Take cancelled orders out of the sales rollups, and put them back if
+    they are un-cancelled.
+    """
+    if created:
+        return
+    status, _ = getattr(instance, '_loaded_state', (instance.status, None))
+    if status != 'cancelled' and instance.status == 'cancelled':
+        apply_order_sales([instance.pk], sign=-1)
+    elif status == 'cancelled' and instance.status != 'cancelled':
+        apply_order_sales([instance.pk])
+
+@receiver(pre_delete, sender=Order)
+def remove_sales_on_delete(sender, instance, **kwargs):
+    """
+    Take deleted orders out of the sales rollups while their lines still
+    exist. Cancelled orders were taken out already.
+    """
+    if instance.status != 'cancelled' and not deleted_order_sales_kept():
+        apply_order_sales([instance.pk], sign=-1)
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def bump_catalog_on_change(sender, instance, **kwargs):
+    """
+    Invalidate catalog ETags whenever a category or menu item changes.
+    """
+    bump_catalog_version()
+
+@receiver(menu_items_bulk_changed)
+def bump_catalog_on_bulk_change(sender, item_ids, **kwargs):
+    bump_catalog_version()
+
+@receiver(post_save, sender=MenuItem)
+def reprice_carts_on_price_change(sender, instance, created, **kwargs):
+    """
+    Carry a menu price change to every open cart line of the item.
+    """
+    if not created and instance.price != getattr(instance, '_loaded_price', None):
+        Cart.reprice(instance.pk, instance.price)
+
+@receiver(menu_items_bulk_changed)
+def reprice_carts_on_bulk_change(sender, item_ids, **kwargs):
+    if item_ids:
+        Cart.reprice_from_menu(item_ids)
@@ -0,0 +1,75 @@
+import threading
+
+from .catalog import get_catalog_version
+from .compiled import compile_serializer
+from .models import MenuItem
+from .search import MenuSearchIndex
+
+class MenuSnapshot:
+    """
+    Immutable copy of the serialized menu with lookup indexes. Records are
+    MenuItemSerializer output, so responses built from them match the
+    database-backed path exactly.
+    """
+    __slots__ = ('version', 'records', 'by_category', 'category_ids', 'featured', '_search_index')
+    
+    def __init__(self, version, records):
+        self.version = version
+        self.records = tuple(records)
+        by_category = {}
+        category_ids = {}
+        for record in self.records:
+            category = record['category']
+            by_category.setdefault(category['id'], []).append(record)
+            category_ids[str(category['id'])] = category['id']
+            category_ids[category['slug']] = category['id']
+            category_ids.setdefault(category['name'].lower(), category['id'])
+        self.by_category = {category_id: tuple(items) for category_id, items in by_category.items()}
+        self.category_ids = category_ids
+        self.featured = tuple(record for record in self.records if record['is_featured'])
+        self._search_index = None
+    
+    def resolve_category(self, value):
+        """Category id for an id, slug or (case-insensitive) name, or None."""
+        return self.category_ids.get(value) or self.category_ids.get(value.lower())
+    
+    def select(self, category_id=None, featured=None):
+        """Records in a category and/or with a featured flag, from the prebuilt indexes."""
+        if category_id is not None:
+            records = self.by_category.get(category_id, ())
+        elif featured:
+            return self.featured
+        else:
+            records = self.records
+        if featured is not None:
+            records = tuple(record for record in records if record['is_featured'] == featured)
+        return records
+    
+    def search(self, query):
+        """Ranked full-text matches; the index is built on first use per version."""
+        if self._search_index is None:
+            self._search_index = MenuSearchIndex(self.records)
+        return self._search_index.search(query)
+
+_snapshot = None
+_lock = threading.Lock()
+
+def build_menu_snapshot(version):
+    from .serializers import MenuItemSerializer
+    compiled = compile_serializer(MenuItemSerializer)
+    return MenuSnapshot(version, compiled.render(compiled.values(MenuItem.objects.order_by('id'))))
+
+def get_menu_snapshot(request=None):
+    """
+    Return this worker's menu snapshot, rebuilding it only when the shared
+    catalog version has moved on.
+    """
+    global _snapshot
+    version = get_catalog_version(request)[0]
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            if _snapshot is None or _snapshot.version != version:
+                _snapshot = build_menu_snapshot(version)
+            snapshot = _snapshot
+    return snapshot
@@ -1,13 +1,72 @@
-from django.test import TestCase, Client
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from asgiref.sync import sync_to_async
+from PIL import Image
+from django.test import AsyncClient, TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase, APIClient
 from rest_framework.authtoken.models import Token
 from rest_framework_simplejwt.tokens import RefreshToken
+from . import images
+from .archive import archive_closed_orders
+from .carts import CacheCartBackend, get_cart_backend, sweep_expired_carts
+from .catalog_io import import_menu
+from .compiled import compile_serializer
+from .dispatch import dispatch_pending_orders
+from .events import broker, order_event, stream_order_events
+from .filters import MenuItemFilter
+from .images import generate_image_variants
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, Cart, Category, CategoryDailySales, MenuItem,
+    MenuItemDailySales, Order, OrderItem,
+)
+from .roles import LOCAL_ROLE_CACHE_TIMEOUT, get_user_roles, role_cache_timeout
+from .serializers import MenuItemSerializer, OrderSerializer
 
 User = get_user_model()
 
+class MenuFixtures:
+    """
+    Builders for the users, categories and menu items most tests start
+    from. Mixed into TestCase or APITestCase classes.
+    """
+    def create_user(self, username='customer', groups=()):
+        user = User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='testpass123'
+        )
+        for name in groups:
+            user.groups.add(Group.objects.get_or_create(name=name)[0])
+        return user
+    
+    def create_category(self, name='Main Course', slug='main-course'):
+        return Category.objects.create(name=name, slug=slug)
+    
+    def create_menu_item(self, name, price, category, **fields):
+        fields.setdefault('description', 'Test dish')
+        fields.setdefault('image', 'menu_images/test.jpg')
+        return MenuItem.objects.create(name=name, price=Decimal(price), category=category, **fields)
+
 class UserRegistrationTest(APITestCase):
     def test_user_registration(self):
         """Test user registration with valid data"""
@@ -207,3 +266,1379 @@ class OrderAPITest(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(response.data['status'])
+
+class CheckoutQueryCountTest(MenuFixtures, TestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.request = APIRequestFactory().post('/api/orders/')
+        self.request.user = self.user
+        
+        category = self.create_category()
+        self.menu_items = [self.create_menu_item(f'Dish {i}', '10.00', category) for i in range(20)]
+    
+    def fill_cart(self, size):
+        for menu_item in self.menu_items[:size]:
+            Cart.objects.create(
+                user=self.user,
+                menu_item=menu_item,
+                quantity=2,
+                unit_price=menu_item.price
+            )
+    
+    def checkout(self):
+        serializer = OrderSerializer(data={}, context={'request': self.request})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save(user=self.user)
+    
+    def test_checkout_query_count_is_constant(self):
+        """Test that checkout costs the same number of queries for 1 or 20 cart lines"""
+        self.fill_cart(1)
+        with CaptureQueriesContext(connection) as small:
+            self.checkout()
+        
+        self.fill_cart(20)
+        with CaptureQueriesContext(connection) as large:
+            order = self.checkout()
+        
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(order.items.count(), 20)
+        self.assertEqual(order.total, Decimal('400.00'))
+    
+    def test_checkout_clears_cart(self):
+        """Test that checkout empties the cart and rejects an empty cart"""
+        self.fill_cart(3)
+        self.checkout()
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+        with self.assertRaises(ValidationError):
+            self.checkout()
+
+class CartBatchAddTest(MenuFixtures, APITestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.client.force_authenticate(user=self.user)
+        get_user_roles(self.user)
+        category = self.create_category()
+        self.menu_items = [self.create_menu_item(f'Dish {i}', f'{i + 1}.50', category) for i in range(20)]
+        self.url = reverse('littlelemonapi:cart')
+    
+    def add(self, lines):
+        return self.client.post(self.url, lines, format='json')
+    
+    def test_batch_add_upserts_in_constant_queries(self):
+        """Test that adding 1 or 20 lines costs the same queries and updates existing lines"""
+        with CaptureQueriesContext(connection) as one:
+            self.add([{'menu_item_id': self.menu_items[0].pk, 'quantity': 1}])
+        lines = [{'menu_item_id': item.pk, 'quantity': 3} for item in self.menu_items]
+        with CaptureQueriesContext(connection) as many:
+            response = self.add(lines)
+        self.assertEqual(len(one), len(many))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 20)
+        
+        line = Cart.objects.get(user=self.user, menu_item=self.menu_items[0])
+        self.assertEqual((line.quantity, line.unit_price, line.price), (3, Decimal('1.50'), Decimal('4.50')))
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 20)
+    
+    def test_batch_add_merges_duplicates_and_rejects_unknown_items(self):
+        """Test that a repeated item keeps its last quantity and unknown ids reject the whole batch"""
+        item = self.menu_items[0]
+        self.add([{'menu_item_id': item.pk, 'quantity': 1}, {'menu_item_id': item.pk, 'quantity': 4}])
+        self.assertEqual(Cart.objects.get(user=self.user, menu_item=item).quantity, 4)
+        
+        response = self.add([{'menu_item_id': self.menu_items[1].pk, 'quantity': 1}, {'menu_item_id': 999999, 'quantity': 1}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 1)
+        
+        self.assertEqual(self.add([]).status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_list_runs_constant_queries_with_summary(self):
+        """Test that listing 1 or 20 lines costs the same queries and totals the whole cart"""
+        self.add([{'menu_item_id': self.menu_items[0].pk, 'quantity': 2}])
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(self.url)
+        self.add([{'menu_item_id': item.pk, 'quantity': 2} for item in self.menu_items])
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(self.url)
+        self.assertEqual(len(one), len(many))
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['summary'], {
+            'item_count': 40,
+            'subtotal': str(sum(item.price * 2 for item in self.menu_items)),
+            'line_count': 20,
+        })
+    
+    def test_sparse_list_skips_menu_item_join(self):
+        """Test that ?fields= without menu_item reads cart lines without joining the menu"""
+        self.add([{'menu_item_id': item.pk, 'quantity': 2} for item in self.menu_items])
+        with CaptureQueriesContext(connection) as full:
+            self.client.get(self.url)
+        with CaptureQueriesContext(connection) as trimmed:
+            response = self.client.get(self.url, {'fields': 'id,quantity'})
+        self.assertEqual(len(trimmed), len(full))
+        self.assertTrue(any('JOIN' in query['sql'] for query in full))
+        self.assertFalse(any('JOIN' in query['sql'] for query in trimmed))
+        self.assertEqual(set(response.data['results'][0]), {'id', 'quantity'})
+    
+    def test_single_add_is_unchanged(self):
+        """Test that posting one object still adds one line"""
+        response = self.add({'menu_item_id': self.menu_items[0].pk, 'quantity': 2})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['price'], '3.00')
+
+class CacheCartBackendTest(MenuFixtures, APITestCase):
+    def setUp(self):
+        cache.clear()
+        settings_override = override_settings(CART_BACKEND='LittleLemonAPI.carts.CacheCartBackend')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = self.create_user()
+        self.client.force_authenticate(user=self.user)
+        category = self.create_category()
+        self.pizza = self.create_menu_item('Pizza', '12.50', category)
+        self.salad = self.create_menu_item('Salad', '8.00', category)
+        self.url = reverse('littlelemonapi:cart')
+    
+    def test_cart_changes_stay_in_cache_until_flushed(self):
+        """Test that adding lines writes nothing to the Cart table until flush_carts runs"""
+        self.client.post(self.url, {'menu_item_id': self.pizza.pk, 'quantity': 2}, format='json')
+        self.client.post(self.url, [{'menu_item_id': self.salad.pk, 'quantity': 1}], format='json')
+        self.assertFalse(Cart.objects.exists())
+        
+        response = self.client.get(self.url)
+        prices = {line['menu_item']['name']: line['price'] for line in response.data['results']}
+        self.assertEqual(prices, {'Pizza': '25.00', 'Salad': '8.00'})
+        self.assertEqual(response.data['summary'], {'item_count': 3, 'subtotal': '33.00', 'line_count': 2})
+        
+        call_command('flush_carts', stdout=StringIO())
+        self.assertEqual(
+            set(Cart.objects.filter(user=self.user).values_list('menu_item__name', 'quantity')),
+            {('Pizza', 2), ('Salad', 1)}
+        )
+        # An evicted cart reloads from the flushed rows
+        cache.clear()
+        self.assertEqual(self.client.get(self.url).data['count'], 2)
+    
+    def test_cached_lines_are_identified_by_menu_item(self):
+        """Test that cached lines carry an id like table rows, taken from their menu item"""
+        response = self.client.post(self.url, {'menu_item_id': self.pizza.pk, 'quantity': 2}, format='json')
+        self.assertEqual(response.data['id'], self.pizza.pk)
+        response = self.client.post(self.url, [{'menu_item_id': self.salad.pk, 'quantity': 1}], format='json')
+        self.assertEqual({line['id'] for line in response.data}, {self.pizza.pk, self.salad.pk})
+        
+        response = self.client.get(self.url, {'fields': 'id,quantity'})
+        lines = {line['id']: line['quantity'] for line in response.data['results']}
+        self.assertEqual(lines, {self.pizza.pk: 2, self.salad.pk: 1})
+    
+    def test_cached_lines_follow_menu_prices(self):
+        """Test that cached lines are read and checked out at the current menu price"""
+        self.client.post(self.url, {'menu_item_id': self.pizza.pk, 'quantity': 2}, format='json')
+        self.pizza.price = Decimal('14.00')
+        self.pizza.save()
+        self.assertEqual(self.client.get(self.url).data['summary']['subtotal'], '28.00')
+        self.client.post(reverse('littlelemonapi:order-list'), {}, format='json')
+        self.assertEqual(Order.objects.get().total, Decimal('28.00'))
+    
+    def test_checkout_orders_cached_lines_and_clears_cart(self):
+        """Test that placing an order works from cached lines and empties both stores"""
+        self.client.post(self.url, [
+            {'menu_item_id': self.pizza.pk, 'quantity': 2},
+            {'menu_item_id': self.salad.pk, 'quantity': 1},
+        ], format='json')
+        response = self.client.post(reverse('littlelemonapi:order-list'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.get().total, Decimal('33.00'))
+        self.assertFalse(Cart.objects.exists())
+        self.assertEqual(self.client.get(self.url).data['count'], 0)
+        
+        response = self.client.post(reverse('littlelemonapi:order-list'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_flush_keeps_changes_made_while_flushing(self):
+        """Test that a cart changed during a flush is written by the next one"""
+        other = User.objects.create_user(username='other', email='other@example.com')
+        backend = get_cart_backend()
+        backend.add(self.user, {self.pizza.pk: (1, self.pizza.price)})
+        write = CacheCartBackend.write
+        
+        def write_and_change(backend, user_id, lines):
+            write(backend, user_id, lines)
+            if user_id == self.user.pk:
+                backend.add(self.user, {self.pizza.pk: (3, self.pizza.price)})
+                backend.add(other, {self.salad.pk: (2, self.salad.price)})
+        
+        with mock.patch.object(CacheCartBackend, 'write', write_and_change):
+            self.assertEqual(backend.flush(), 1)
+        self.assertEqual(backend.flush(), 2)
+        self.assertEqual(
+            set(Cart.objects.values_list('user_id', 'quantity')),
+            {(self.user.pk, 3), (other.pk, 2)}
+        )
+        self.assertEqual(backend.flush(), 0)
+    
+    def test_sweep_keeps_unflushed_cart_changes(self):
+        """Test that expiring old rows flushes newer cached lines instead of dropping them"""
+        backend = get_cart_backend()
+        backend.add(self.user, {self.pizza.pk: (1, self.pizza.price)})
+        backend.flush()
+        Cart.objects.update(updated_at=timezone.now() - timedelta(days=30))
+        backend.add(self.user, {self.salad.pk: (2, self.salad.price)})
+        
+        self.assertEqual(sweep_expired_carts(days=14)['lines'], 0)
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 2)
+
+class CartRepricingTest(MenuFixtures, TestCase):
+    def setUp(self):
+        category = self.create_category()
+        self.pizza = self.create_menu_item('Pizza', '12.50', category)
+        self.salad = self.create_menu_item('Salad', '8.00', category)
+        users = User.objects.bulk_create([
+            User(username=f'customer{i}', email=f'customer{i}@example.com') for i in range(30)
+        ])
+        Cart.objects.bulk_create([
+            Cart(user=user, menu_item=item, quantity=2, unit_price=item.price, price=item.price * 2)
+            for user in users
+            for item in (self.pizza, self.salad)
+        ])
+    
+    def cart_updates(self, queries):
+        return [query for query in queries if query['sql'].startswith('UPDATE "LittleLemonAPI_cart"')]
+    
+    def test_price_change_reprices_open_carts_in_one_update(self):
+        """Test that saving a new price updates every cart line of the item in one statement"""
+        with CaptureQueriesContext(connection) as queries:
+            self.pizza.price = Decimal('14.00')
+            self.pizza.save()
+        self.assertEqual(len(self.cart_updates(queries)), 1)
+        self.assertEqual(
+            set(Cart.objects.filter(menu_item=self.pizza).values_list('unit_price', 'price')),
+            {(Decimal('14.00'), Decimal('28.00'))}
+        )
+        self.assertEqual(set(Cart.objects.filter(menu_item=self.salad).values_list('price', flat=True)), {Decimal('16.00')})
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.pizza.description = 'Now with basil'
+            self.pizza.save()
+        self.assertEqual(self.cart_updates(queries), [])
+    
+    def test_bulk_price_edits_reprice_in_one_update(self):
+        """Test that a catalog import reprices the lines of every changed item in one statement"""
+        rows = [
+            'id,name,description,price,category,is_featured',
+            f'{self.pizza.pk},Pizza,Test dish,11.00,main-course,false',
+            f'{self.salad.pk},Salad,Test dish,9.00,main-course,false',
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            import_menu(io.StringIO('\n'.join(rows)))
+        self.assertEqual(len(self.cart_updates(queries)), 1)
+        self.assertEqual(
+            dict(Cart.objects.values_list('menu_item__name', 'price').distinct()),
+            {'Pizza': Decimal('22.00'), 'Salad': Decimal('18.00')}
+        )
+
+class CartExpiryTest(MenuFixtures, APITestCase):
+    def setUp(self):
+        category = self.create_category()
+        self.pizza = self.create_menu_item('Pizza', '12.50', category)
+        self.salad = self.create_menu_item('Salad', '8.00', category)
+        self.users = User.objects.bulk_create([
+            User(username=f'customer{i}', email=f'customer{i}@example.com') for i in range(5)
+        ])
+        Cart.objects.bulk_create([
+            Cart(user=user, menu_item=item, quantity=1, unit_price=item.price, price=item.price)
+            for user in self.users
+            for item in (self.pizza, self.salad)
+        ])
+        # The first three carts were abandoned a month ago
+        Cart.objects.filter(user__in=self.users[:3]).update(updated_at=timezone.now() - timedelta(days=30))
+    
+    def test_sweep_deletes_expired_lines_in_batches(self):
+        """Test that the sweeper reclaims only stale lines, in batches, and reports how many"""
+        out = StringIO()
+        with self.assertLogs('LittleLemonAPI.carts', 'INFO') as logs:
+            call_command('sweep_carts', '--days', '14', '--batch-size', '4', stdout=out)
+        self.assertIn('Reclaimed 6 cart lines from 3 carts in 2 batches', out.getvalue())
+        self.assertEqual(logs.records[0].cart_sweep['lines'], 6)
+        self.assertEqual(set(Cart.objects.values_list('user_id', flat=True)), {user.pk for user in self.users[3:]})
+    
+    def test_changing_a_line_renews_it(self):
+        """Test that adding to a cart again moves its line's last-touched time forward"""
+        self.client.force_authenticate(user=self.users[0])
+        self.client.post(reverse('littlelemonapi:cart'), [{'menu_item_id': self.pizza.pk, 'quantity': 2}], format='json')
+        stats = sweep_expired_carts(days=14)
+        self.assertEqual((stats['lines'], stats['carts']), (5, 3))
+        self.assertEqual(list(Cart.objects.filter(user=self.users[0]).values_list('menu_item_id', flat=True)), [self.pizza.pk])
+
+class OrderTotalTest(MenuFixtures, TestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        category = self.create_category()
+        self.pizza = self.create_menu_item('Pizza', '12.50', category)
+        self.salad = self.create_menu_item('Salad', '8.00', category)
+        self.order = Order.objects.create(user=self.user)
+    
+    def add_item(self, menu_item, quantity):
+        return OrderItem.objects.create(
+            order=self.order,
+            menu_item=menu_item,
+            quantity=quantity,
+            unit_price=menu_item.price
+        )
+    
+    def assertTotal(self, expected):
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total, Decimal(expected))
+    
+    def test_total_follows_item_changes(self):
+        """Test that creating, updating and deleting items adjusts the total"""
+        pizza = self.add_item(self.pizza, 2)
+        salad = self.add_item(self.salad, 1)
+        self.assertTotal('33.00')
+        
+        pizza.quantity = 1
+        pizza.save()
+        self.assertTotal('20.50')
+        
+        salad.delete()
+        self.assertTotal('12.50')
+        
+        self.order.items.all().delete()
+        self.assertTotal('0')
+    
+    def test_saving_a_stale_order_keeps_its_total(self):
+        """Test that saving an order loaded before its lines changed doesn't write back the old total"""
+        stale = Order.objects.get(pk=self.order.pk)
+        self.add_item(self.pizza, 2)
+        stale.status = 'processing'
+        stale.save()
+        self.assertTotal('25.00')
+        self.assertEqual(self.order.status, 'processing')
+    
+    def test_deleting_a_menu_item_keeps_order_totals(self):
+        """Test that lines removed by a menu item cascade don't change what the order cost"""
+        self.add_item(self.pizza, 2)
+        self.add_item(self.salad, 1)
+        self.salad.delete()
+        self.assertTotal('33.00')
+    
+    def test_item_save_does_not_scan_order(self):
+        """Test that saving an item costs the same with 1 or many sibling lines"""
+        pizza = self.add_item(self.pizza, 1)
+        with CaptureQueriesContext(connection) as few:
+            pizza.save()
+        self.add_item(self.salad, 3)
+        with CaptureQueriesContext(connection) as more:
+            pizza.save()
+        self.assertEqual(len(few), len(more))
+    
+    def test_reconcile_order_totals_repairs_drift(self):
+        """Test that the reconcile command fixes totals that have drifted"""
+        self.add_item(self.pizza, 2)
+        Order.objects.filter(pk=self.order.pk).update(total=Decimal('1.00'))
+        
+        out = StringIO()
+        call_command('reconcile_order_totals', '--dry-run', stdout=out)
+        self.assertIn('Found 1 drifted', out.getvalue())
+        self.assertTotal('1.00')
+        
+        call_command('reconcile_order_totals', '--chunk-size', '1', stdout=out)
+        self.assertTotal('25.00')
+    
+    def test_reconcile_keeps_totals_of_cascaded_lines(self):
+        """Test that reconcile agrees with totals kept after a menu item delete"""
+        self.add_item(self.pizza, 1)
+        self.add_item(self.salad, 1)
+        self.salad.delete()
+        out = StringIO()
+        call_command('reconcile_order_totals', stdout=out)
+        self.assertIn('Repaired 0 drifted', out.getvalue())
+        self.assertTotal('20.50')
+
+class OrderQueryBudgetTest(MenuFixtures, APITestCase):
+    # Page count, orders with users, items with menu items (roles are cached)
+    ORDER_LIST_BUDGET = 3
+    # Order with users, items with menu items (roles are cached)
+    ORDER_DETAIL_BUDGET = 2
+    
+    def setUp(self):
+        self.manager = self.create_user('manager', groups=['Manager'])
+        self.client.force_authenticate(user=self.manager)
+        get_user_roles(self.manager)
+        
+        category = self.create_category()
+        self.menu_items = [self.create_menu_item(f'Dish {i}', '10.00', category) for i in range(3)]
+    
+    def create_orders(self, count):
+        for i in range(count):
+            customer = User.objects.create_user(
+                username=f'customer{Order.objects.count()}',
+                email=f'customer{Order.objects.count()}@example.com',
+                password='testpass123'
+            )
+            order = Order.objects.create(user=customer, delivery_crew=self.manager)
+            for menu_item in self.menu_items:
+                OrderItem.objects.create(
+                    order=order,
+                    menu_item=menu_item,
+                    quantity=1,
+                    unit_price=menu_item.price
+                )
+        return order
+    
+    def test_order_list_query_budget(self):
+        """Test that the manager's order list stays within a fixed query budget"""
+        url = reverse('littlelemonapi:order-list')
+        self.create_orders(1)
+        with self.assertNumQueries(self.ORDER_LIST_BUDGET):
+            self.client.get(url)
+        
+        self.create_orders(9)
+        with self.assertNumQueries(self.ORDER_LIST_BUDGET):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(len(response.data['results'][0]['items']), 3)
+    
+    def test_order_detail_query_budget(self):
+        """Test that an order detail stays within a fixed query budget"""
+        order = self.create_orders(1)
+        url = reverse('littlelemonapi:order-detail', kwargs={'pk': order.pk})
+        with self.assertNumQueries(self.ORDER_DETAIL_BUDGET):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_order_list_cursor_pagination(self):
+        """Test that cursor mode walks the feed newest first without counting"""
+        self.create_orders(12)
+        url = reverse('littlelemonapi:order-list')
+        with self.assertNumQueries(self.ORDER_LIST_BUDGET - 1):
+            response = self.client.get(url, {'pagination': 'cursor'})
+        self.assertNotIn('count', response.data)
+        first_page = [order['id'] for order in response.data['results']]
+        
+        response = self.client.get(response.data['next'])
+        second_page = [order['id'] for order in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(
+            first_page + second_page,
+            list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        )
+    
+    def test_order_list_filters(self):
+        """Test filtering the orders feed by status and delivery crew"""
+        order = self.create_orders(3)
+        Order.objects.filter(pk=order.pk).update(status='delivered', delivery_crew=None)
+        url = reverse('littlelemonapi:order-list')
+        
+        response = self.client.get(url, {'status': 'delivered'})
+        self.assertEqual([o['id'] for o in response.data['results']], [order.pk])
+        
+        response = self.client.get(url, {'delivery_crew': self.manager.pk, 'pagination': 'cursor'})
+        self.assertEqual(len(response.data['results']), 2)
+    
+    def test_sparse_fieldsets_skip_unused_relations(self):
+        """Test that ?fields= drops relations from both the output and the queries"""
+        self.create_orders(5)
+        url = reverse('littlelemonapi:order-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'id,status'})
+        self.assertEqual(len(queries), self.ORDER_LIST_BUDGET - 1)
+        self.assertFalse(any('JOIN' in query['sql'] for query in queries))
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status'})
+    
+    def test_expand_nests_only_requested_relations(self):
+        """Test that relations are ids unless expanded, and expansion follows dotted paths"""
+        order = self.create_orders(1)
+        url = reverse('littlelemonapi:order-detail', kwargs={'pk': order.pk})
+        
+        response = self.client.get(url, {'expand': 'user'})
+        self.assertEqual(response.data['user']['username'], order.user.username)
+        self.assertEqual(response.data['delivery_crew'], self.manager.pk)
+        self.assertEqual(response.data['items'][0]['menu_item'], self.menu_items[0].pk)
+        
+        with self.assertNumQueries(self.ORDER_DETAIL_BUDGET):
+            response = self.client.get(url, {'fields': 'id,items.quantity,items.menu_item', 'expand': 'items.menu_item'})
+        self.assertEqual(set(response.data), {'id', 'items'})
+        item = response.data['items'][0]
+        self.assertEqual(set(item), {'quantity', 'menu_item'})
+        self.assertEqual(item['menu_item']['category'], self.menu_items[0].category_id)
+
+class CompiledSerializerTest(MenuFixtures, APITestCase):
+    def setUp(self):
+        self.manager = self.create_user('manager', groups=['Manager'])
+        self.client.force_authenticate(user=self.manager)
+        get_user_roles(self.manager)
+        
+        category = self.create_category()
+        menu_items = [
+            self.create_menu_item(f'Dish {i}', '10.50', category, image='menu_images/test dish.jpg' if i else '')
+            for i in range(2)
+        ]
+        for crew in (self.manager, None):
+            order = Order.objects.create(user=self.manager, delivery_crew=crew)
+            for menu_item in menu_items:
+                OrderItem.objects.create(
+                    order=order, menu_item=menu_item, quantity=2, unit_price=menu_item.price
+                )
+    
+    def serializer_data(self, serializer_class, queryset, params=None):
+        request = Request(APIRequestFactory().get('/', params or {}))
+        return serializer_class(queryset, many=True, context={'request': request}).data
+    
+    def test_compiled_output_matches_serializers(self):
+        """Test that compiled rows render exactly like the DRF serializers"""
+        cases = [
+            (MenuItemSerializer, MenuItem.objects.order_by('id'), {}),
+            (MenuItemSerializer, MenuItem.objects.order_by('id'), {'fields': 'id,image,category'}),
+            (OrderSerializer, Order.objects.order_by('id'), {}),
+            (OrderSerializer, Order.objects.order_by('id'), {'fields': 'id,delivery_crew,items.menu_item.name', 'expand': 'delivery_crew,items.menu_item'}),
+        ]
+        for serializer_class, queryset, params in cases:
+            with self.subTest(serializer=serializer_class.__name__, params=params):
+                request = Request(APIRequestFactory().get('/', params))
+                compiled = compile_serializer(serializer_class, {'request': request})
+                self.assertEqual(
+                    compiled.render(compiled.values(queryset)),
+                    self.serializer_data(serializer_class, queryset, params)
+                )
+    
+    def test_order_list_uses_compiled_rows(self):
+        """Test that the order list is built from values() rows, items included"""
+        url = reverse('littlelemonapi:order-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(
+            response.data['results'],
+            self.serializer_data(OrderSerializer, Order.objects.order_by('-created_at', '-id'))
+        )
+        # Page count, order rows, item rows (roles are cached)
+        self.assertEqual(len(queries), 3)
+        
+        response = self.client.get(url, {'pagination': 'cursor', 'page_size': 1})
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+
+class RoleCacheTest(TestCase):
+    def setUp(self):
+        self.manager_group = Group.objects.get_or_create(name='Manager')[0]
+        self.user = User.objects.create_user(
+            username='staff',
+            email='staff@example.com',
+            password='testpass123'
+        )
+    
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+    
+    def test_roles_are_cached_across_requests(self):
+        """Test that a user's roles are loaded once and then served from cache"""
+        get_user_roles(self.fresh_user())
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            roles = get_user_roles(user)
+        self.assertEqual(roles, {'Customer'})
+    
+    def test_group_changes_invalidate_cache(self):
+        """Test that adding or removing groups from either side refreshes roles"""
+        self.assertNotIn('Manager', get_user_roles(self.fresh_user()))
+        
+        self.user.groups.add(self.manager_group)
+        self.assertIn('Manager', get_user_roles(self.fresh_user()))
+        
+        self.manager_group.littlelemon_user_set.remove(self.user)
+        self.assertNotIn('Manager', get_user_roles(self.fresh_user()))
+        
+        self.manager_group.littlelemon_user_set.add(self.user)
+        self.assertIn('Manager', get_user_roles(self.fresh_user()))
+        
+        self.manager_group.littlelemon_user_set.clear()
+        self.assertNotIn('Manager', get_user_roles(self.fresh_user()))
+    
+    def test_per_process_cache_keeps_roles_briefly(self):
+        """Test that roles are only cached for seconds unless the cache is shared between processes"""
+        self.assertEqual(role_cache_timeout(), LOCAL_ROLE_CACHE_TIMEOUT)
+        with tempfile.TemporaryDirectory() as location:
+            shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+            with override_settings(CACHES=shared, ROLE_CACHE_TIMEOUT=600):
+                self.assertEqual(role_cache_timeout(), 600)
+
+class DispatchTest(APITestCase):
+    def setUp(self):
+        crew_group = Group.objects.get_or_create(name='Delivery Crew')[0]
+        self.crew = []
+        for i in range(3):
+            member = User.objects.create_user(
+                username=f'crew{i}',
+                email=f'crew{i}@example.com',
+                password='testpass123'
+            )
+            member.groups.add(crew_group)
+            self.crew.append(member)
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='testpass123'
+        )
+        # crew0 already has two open orders
+        for _ in range(2):
+            Order.objects.create(user=self.customer, delivery_crew=self.crew[0], status='processing')
+        for _ in range(10):
+            Order.objects.create(user=self.customer)
+    
+    def crew_loads(self):
+        return [
+            Order.objects.filter(delivery_crew=member, status__in=['pending', 'processing']).count()
+            for member in self.crew
+        ]
+    
+    def test_dispatch_balances_by_open_load(self):
+        """Test that pending orders go to the least loaded crew members"""
+        assigned = dispatch_pending_orders(batch_size=3)
+        self.assertEqual(sum(assigned.values()), 10)
+        self.assertEqual(self.crew_loads(), [4, 4, 4])
+        self.assertFalse(Order.objects.filter(delivery_crew__isnull=True).exists())
+    
+    def test_dispatch_respects_limit(self):
+        """Test that the dispatcher stops after the requested number of orders"""
+        assigned = dispatch_pending_orders(batch_size=4, limit=5)
+        self.assertEqual(sum(assigned.values()), 5)
+    
+    def test_dispatch_endpoint_is_manager_only(self):
+        """Test that only managers can trigger dispatch over the API"""
+        url = reverse('littlelemonapi:order-dispatch')
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.customer.groups.add(Group.objects.get_or_create(name='Manager')[0])
+        response = self.client.post(url, {'limit': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['assigned'], 2)
+
+class OrderEventsTest(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='testpass123'
+        )
+        self.other = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.crew = User.objects.create_user(
+            username='crew',
+            email='crew@example.com',
+            password='testpass123'
+        )
+        self.crew.groups.add(Group.objects.get_or_create(name='Delivery Crew')[0])
+        self.order = Order.objects.create(user=self.customer)
+    
+    def test_status_change_publishes_scoped_event(self):
+        """Test that saving a status change publishes to the right subscribers only"""
+        users = (self.customer, self.other, self.crew)
+        roles = [get_user_roles(user) for user in users]
+        
+        async def listen():
+            return [broker.subscribe(user.pk, role_set) for user, role_set in zip(users, roles)]
+        
+        loop = asyncio.new_event_loop()
+        try:
+            customer_sub, other_sub, crew_sub = loop.run_until_complete(listen())
+            order = Order.objects.get(pk=self.order.pk)
+            order.status = 'processing'
+            order.delivery_crew = self.crew
+            with self.captureOnCommitCallbacks(execute=True):
+                order.save()
+            loop.run_until_complete(asyncio.sleep(0))
+            
+            event = customer_sub.queue.get_nowait()
+            self.assertEqual(event['order'], self.order.pk)
+            self.assertEqual(event['status'], 'processing')
+            self.assertEqual(sorted(event['changed']), ['delivery_crew', 'status'])
+            self.assertEqual(crew_sub.queue.get_nowait()['delivery_crew'], self.crew.pk)
+            self.assertTrue(other_sub.queue.empty())
+        finally:
+            for subscription in (customer_sub, other_sub, crew_sub):
+                broker.unsubscribe(subscription)
+            loop.close()
+    
+    def test_stream_requires_authentication(self):
+        """Test that the event stream rejects anonymous clients"""
+        response = self.client.get(reverse('littlelemonapi:order-events'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    async def test_stream_delivers_events(self):
+        """Test that a connected client receives published events as SSE"""
+        token = await sync_to_async(Token.objects.create)(user=self.customer)
+        response = await AsyncClient().get(
+            reverse('littlelemonapi:order-events'),
+            headers={'Authorization': f'Token {token.key}'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b': connected\n\n')
+        broker.publish(order_event(self.order.pk, self.customer.pk, 'delivered', None, ['status']))
+        chunk = await anext(stream)
+        self.assertTrue(chunk.startswith(b'event: order\ndata: '))
+        self.assertIn(b'"delivered"', chunk)
+        await stream.aclose()
+    
+    async def test_stream_narrows_when_roles_are_revoked(self):
+        """Test that a crew member removed from the group stops receiving assigned orders"""
+        token = await sync_to_async(Token.objects.create)(user=self.crew)
+        response = await AsyncClient().get(
+            reverse('littlelemonapi:order-events'),
+            headers={'Authorization': f'Token {token.key}'}
+        )
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        
+        def revoke():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.crew.groups.clear()
+        await sync_to_async(revoke)()
+        broker.publish(order_event(self.order.pk, self.customer.pk, 'processing', self.crew.pk, ['status']))
+        broker.publish(order_event(self.order.pk + 1, self.crew.pk, 'pending', None, ['created']))
+        chunk = await anext(stream)
+        self.assertIn(f'"order": {self.order.pk + 1}'.encode(), chunk)
+        await stream.aclose()
+    
+    async def test_stream_rereads_roles_on_heartbeat(self):
+        """Test that roles changed in another process are picked up at the next heartbeat"""
+        roles = [frozenset({'Delivery Crew'}), frozenset()]
+        
+        async def load_roles():
+            return roles[0]
+        
+        stream = stream_order_events(self.crew.pk, load_roles, heartbeat=0.01)
+        await anext(stream)
+        roles.pop(0)
+        self.assertEqual(await anext(stream), ': keep-alive\n\n')
+        broker.publish(order_event(self.order.pk, self.customer.pk, 'processing', self.crew.pk, ['status']))
+        self.assertEqual(await anext(stream), ': keep-alive\n\n')
+        await stream.aclose()
+
+class OrderBulkUpdateTest(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='testpass123'
+        )
+        self.manager.groups.add(Group.objects.get_or_create(name='Manager')[0])
+        self.crew = User.objects.create_user(
+            username='crew',
+            email='crew@example.com',
+            password='testpass123'
+        )
+        self.crew.groups.add(Group.objects.get_or_create(name='Delivery Crew')[0])
+        customer = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='testpass123'
+        )
+        self.orders = [Order.objects.create(user=customer) for _ in range(5)]
+        self.url = reverse('littlelemonapi:order-bulk-update')
+    
+    def test_manager_bulk_assign_and_status(self):
+        """Test that a manager updates many orders in a constant number of queries"""
+        self.client.force_authenticate(user=self.manager)
+        get_user_roles(self.manager)
+        ids = [order.pk for order in self.orders] + [9999]
+        
+        # Crew lookup, lock and read, one UPDATE (plus savepoint bookkeeping)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                self.url,
+                {'ids': ids, 'status': 'processing', 'delivery_crew': self.crew.pk},
+                format='json'
+            )
+        self.assertLessEqual(len(queries), 5)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 5)
+        self.assertEqual(response.data['results'][-1], {'id': 9999, 'updated': False, 'error': 'Not found.'})
+        self.assertEqual(
+            Order.objects.filter(status='processing', delivery_crew=self.crew).count(), 5
+        )
+    
+    def test_delivery_crew_limited_to_status_on_own_orders(self):
+        """Test that delivery crew can only change status on orders assigned to them"""
+        Order.objects.filter(pk=self.orders[0].pk).update(delivery_crew=self.crew)
+        self.client.force_authenticate(user=self.crew)
+        
+        response = self.client.post(
+            self.url,
+            {'ids': [self.orders[0].pk], 'delivery_crew': self.crew.pk},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        response = self.client.post(
+            self.url,
+            {'ids': [self.orders[0].pk, self.orders[1].pk], 'status': 'delivered'},
+            format='json'
+        )
+        self.assertEqual(response.data['updated'], 1)
+        self.assertFalse(response.data['results'][1]['updated'])
+        self.assertEqual(Order.objects.get(pk=self.orders[0].pk).status, 'delivered')
+        self.assertEqual(Order.objects.get(pk=self.orders[1].pk).status, 'pending')
+    
+    def test_bulk_update_requires_a_change(self):
+        """Test that a request without status or delivery_crew is rejected"""
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.post(self.url, {'ids': [self.orders[0].pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class OrderArchiveTest(MenuFixtures, APITestCase):
+    def setUp(self):
+        self.customer = self.create_user()
+        menu_item = self.create_menu_item('Pizza', '12.50', self.create_category())
+        old = timezone.now() - timedelta(days=120)
+        for order_status in ['delivered', 'cancelled', 'delivered', 'pending']:
+            order = Order.objects.create(user=self.customer, status=order_status)
+            OrderItem.objects.create(
+                order=order,
+                menu_item=menu_item,
+                quantity=2,
+                unit_price=menu_item.price
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=old)
+        # A recent delivered order stays live
+        self.recent = Order.objects.create(user=self.customer, status='delivered')
+    
+    def test_archive_moves_closed_orders_in_chunks(self):
+        """Test that old closed orders and their items move to the archive"""
+        out = StringIO()
+        call_command('archive_orders', '--days', '90', '--dry-run', stdout=out)
+        self.assertIn('Would archive 3 orders', out.getvalue())
+        
+        call_command('archive_orders', '--days', '90', '--chunk-size', '2', stdout=out)
+        self.assertIn('Archived 3 orders', out.getvalue())
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(OrderItem.objects.count(), 1)
+        self.assertEqual(ArchivedOrder.objects.count(), 3)
+        self.assertEqual(ArchivedOrderItem.objects.count(), 3)
+        archived = ArchivedOrder.objects.first()
+        self.assertEqual(archived.total, Decimal('25.00'))
+        self.assertEqual(archived.items.get().menu_item_name, 'Pizza')
+    
+    def test_conflicting_archive_ids_keep_live_orders(self):
+        """Test that an order id already in the archive is kept live and reported while the rest are archived"""
+        first = Order.objects.filter(status='delivered').order_by('pk').first()
+        ArchivedOrder.objects.create(
+            id=first.pk, user=self.customer, status='delivered', total=first.total,
+            date=first.date, created_at=first.created_at, updated_at=first.updated_at
+        )
+        
+        self.assertEqual(archive_closed_orders(days=90, dry_run=True), 2)
+        with self.assertLogs('LittleLemonAPI.archive', 'WARNING') as logs:
+            self.assertEqual(archive_closed_orders(days=90, chunk_size=1), 2)
+        self.assertEqual(logs.records[0].archive_conflicts, [first.pk])
+        self.assertTrue(Order.objects.filter(pk=first.pk).exists())
+        self.assertEqual(first.items.count(), 1)
+        self.assertEqual(ArchivedOrder.objects.count(), 3)
+    
+    def test_customer_can_read_archived_history(self):
+        """Test that customers still see their archived orders"""
+        archive_closed_orders(days=90)
+        self.client.force_authenticate(user=self.customer)
+        
+        response = self.client.get(reverse('littlelemonapi:order-history'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        order_id = response.data['results'][0]['id']
+        
+        response = self.client.get(reverse('littlelemonapi:order-history-detail', kwargs={'pk': order_id}))
+        self.assertEqual(response.data['items'][0]['menu_item_name'], 'Pizza')
+        
+        other = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=other)
+        response = self.client.get(reverse('littlelemonapi:order-history-detail', kwargs={'pk': order_id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class SalesRollupTest(MenuFixtures, APITestCase):
+    def setUp(self):
+        self.manager = self.create_user('manager', groups=['Manager'])
+        self.customer = self.create_user()
+        self.request = APIRequestFactory().post('/api/orders/')
+        self.request.user = self.customer
+        
+        self.pizza = self.create_menu_item('Pizza', '12.50', self.create_category())
+        self.cake = self.create_menu_item('Cake', '6.00', self.create_category('Desserts', 'desserts'))
+    
+    def checkout(self, lines):
+        for menu_item, quantity in lines:
+            Cart.objects.create(
+                user=self.customer,
+                menu_item=menu_item,
+                quantity=quantity,
+                unit_price=menu_item.price
+            )
+        serializer = OrderSerializer(data={}, context={'request': self.request})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save(user=self.customer)
+    
+    def report(self, **params):
+        self.client.force_authenticate(user=self.manager)
+        return self.client.get(reverse('littlelemonapi:sales-report'), params)
+    
+    def test_rollups_follow_checkout_and_cancel(self):
+        """Test that checkout adds to the rollups and cancelling takes it back out"""
+        first = self.checkout([(self.pizza, 2), (self.cake, 1)])
+        self.checkout([(self.pizza, 1)])
+        
+        pizza = MenuItemDailySales.objects.get(menu_item=self.pizza)
+        self.assertEqual((pizza.quantity, pizza.revenue), (3, Decimal('37.50')))
+        
+        first.status = 'cancelled'
+        first.save()
+        pizza.refresh_from_db()
+        self.assertEqual((pizza.quantity, pizza.revenue), (1, Decimal('12.50')))
+        self.assertEqual(CategoryDailySales.objects.get(category=self.cake.category).quantity, 0)
+        
+        response = self.report(group_by='category')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['revenue'], '12.50')
+        self.assertEqual(response.data['results'][0]['name'], 'Main Course')
+    
+    def test_deleted_orders_leave_the_rollups(self):
+        """Test that deleting an order takes its sales out, unless it was cancelled or is being archived"""
+        deleted = self.checkout([(self.pizza, 2)])
+        cancelled = self.checkout([(self.pizza, 1)])
+        archived = self.checkout([(self.pizza, 4)])
+        cancelled.status = 'cancelled'
+        cancelled.save()
+        
+        self.client.force_authenticate(user=self.manager)
+        for order in (deleted, cancelled):
+            response = self.client.delete(reverse('littlelemonapi:order-detail', kwargs={'pk': order.pk}))
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        pizza = MenuItemDailySales.objects.get(menu_item=self.pizza)
+        self.assertEqual((pizza.quantity, pizza.revenue), (4, Decimal('50.00')))
+        
+        archived.status = 'delivered'
+        archived.save()
+        self.assertEqual(archive_closed_orders(days=-1), 1)
+        pizza.refresh_from_db()
+        self.assertEqual(pizza.quantity, 4)
+    
+    def test_rebuild_matches_incremental(self):
+        """Test that rebuilding from raw orders gives the same rollups"""
+        self.checkout([(self.pizza, 2), (self.cake, 3)])
+        before = self.report().data
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        self.assertEqual(self.report().data, before)
+        self.assertEqual(before['quantity'], 5)
+    
+    def test_report_is_manager_only(self):
+        """Test that customers cannot read sales reports"""
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.get(reverse('littlelemonapi:sales-report'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class CatalogConditionalGetTest(MenuFixtures, APITestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.client.force_authenticate(user=self.user)
+        self.category = self.create_category()
+        self.menu_item = self.create_menu_item('Pizza', '12.50', self.category)
+        self.url = reverse('littlelemonapi:menuitem-list')
+    
+    def test_unchanged_catalog_returns_304_without_listing(self):
+        """Test that a matching ETag short-circuits before the queryset runs"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        response = self.client.get(
+            reverse('littlelemonapi:category-list'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_catalog_changes_bump_etag(self):
+        """Test that saving or deleting categories and menu items changes the ETag"""
+        etag = self.client.get(self.url)['ETag']
+        
+        self.category.description = 'Hearty dishes'
+        self.category.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        
+        self.menu_item.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+
+class MenuSnapshotTest(MenuFixtures, APITestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.client.force_authenticate(user=self.user)
+        mains = self.create_category()
+        desserts = self.create_category('Desserts', 'desserts')
+        for name, category, featured in [
+            ('Pizza', mains, True), ('Pasta', mains, False), ('Cake', desserts, True),
+        ]:
+            self.create_menu_item(name, '9.00', category, is_featured=featured)
+        self.url = reverse('littlelemonapi:menuitem-list')
+    
+    def names(self, response):
+        return [item['name'] for item in response.data['results']]
+    
+    def test_list_matches_serializer_and_skips_database_when_warm(self):
+        """Test that snapshot output matches MenuItemSerializer with no queries once warm"""
+        response = self.client.get(self.url)
+        request = APIRequestFactory().get(self.url)
+        expected = MenuItemSerializer(
+            MenuItem.objects.order_by('id'), many=True, context={'request': request}
+        ).data
+        self.assertEqual(response.data['results'], expected)
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'category': 'main course', 'featured': 'true'})
+        self.assertEqual(self.names(response), ['Pizza'])
+    
+    def test_snapshot_refreshes_after_catalog_change(self):
+        """Test that the snapshot is rebuilt when the catalog version changes"""
+        self.assertEqual(self.names(self.client.get(self.url, {'featured': 'true'})), ['Pizza', 'Cake'])
+        MenuItem.objects.filter(name='Pasta').get().delete()
+        pasta_gone = self.client.get(self.url, {'category': 'Main Course'})
+        self.assertEqual(self.names(pasta_gone), ['Pizza'])
+
+class MenuItemSearchTest(MenuFixtures, APITestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.client.force_authenticate(user=self.user)
+        mains = self.create_category()
+        desserts = self.create_category('Desserts', 'desserts')
+        for name, description, category in [
+            ('Margherita Pizza', 'Tomato, mozzarella and basil', mains),
+            ('Greek Salad', 'Crisp lettuce, feta cheese and olives', mains),
+            ('Lemon Dessert', 'Lemon cake with a pizza-sized slice of cream', desserts),
+        ]:
+            self.create_menu_item(name, '9.00', category, description=description)
+        self.url = reverse('littlelemonapi:menuitem-search')
+    
+    def search(self, q):
+        response = self.client.get(self.url, {'q': q})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in response.data['results']]
+    
+    def test_name_matches_rank_above_description_matches(self):
+        """Test that a hit in the name outranks a hit in the description"""
+        self.assertEqual(self.search('pizza'), ['Margherita Pizza', 'Lemon Dessert'])
+    
+    def test_prefix_typo_and_category_matching(self):
+        """Test prefix, single-typo and category-name matching"""
+        self.assertEqual(self.search('mozz'), ['Margherita Pizza'])
+        self.assertEqual(self.search('salda'), ['Greek Salad'])
+        self.assertEqual(self.search('desserts lemon'), ['Lemon Dessert'])
+        self.assertEqual(self.search('feta olives'), ['Greek Salad'])
+        self.assertEqual(self.search('sushi'), [])
+    
+    def test_index_follows_saves(self):
+        """Test that saved menu items are searchable straight away"""
+        self.search('pizza')
+        item = MenuItem.objects.get(name='Greek Salad')
+        item.name = 'Greek Pizza Salad'
+        item.save()
+        self.assertIn('Greek Pizza Salad', self.search('pizza'))
+    
+    def test_missing_query_is_rejected(self):
+        """Test that an empty query returns 400"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class MenuItemFilterTest(MenuFixtures, APITestCase):
+    def setUp(self):
+        self.user = self.create_user()
+        self.client.force_authenticate(user=self.user)
+        self.mains = self.create_category()
+        self.desserts = self.create_category('Desserts', 'desserts')
+        for name, price, category, featured in [
+            ('Pizza', '12.50', self.mains, True),
+            ('Pasta', '10.00', self.mains, False),
+            ('Steak', '24.00', self.mains, True),
+            ('Cake', '6.00', self.desserts, True),
+        ]:
+            self.create_menu_item(name, price, category, is_featured=featured)
+        self.url = reverse('littlelemonapi:menuitem-list')
+    
+    def names(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in response.data['results']]
+    
+    def db_names(self, **params):
+        return list(MenuItemFilter(params).filter_queryset(MenuItem.objects.all()).values_list('name', flat=True))
+    
+    def test_filters_and_ordering(self):
+        """Test category, featured, price range and ordering through the view and the filter"""
+        cases = [
+            ({'category': 'main-course', 'ordering': 'price'}, ['Pasta', 'Pizza', 'Steak']),
+            ({'category': str(self.mains.pk), 'featured': 'true', 'ordering': '-price'}, ['Steak', 'Pizza']),
+            ({'category': 'Main Course', 'min_price': '11', 'max_price': '20'}, ['Pizza']),
+            ({'featured': 'true', 'ordering': 'name'}, ['Cake', 'Pizza', 'Steak']),
+            ({'ordering': '-created_at'}, ['Cake', 'Steak', 'Pasta', 'Pizza']),
+            ({'category': 'no-such-category'}, []),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                self.assertEqual(self.names(**params), expected)
+                self.assertEqual(self.db_names(**params), expected)
+    
+    def test_invalid_filters_are_rejected(self):
+        """Test that bad prices and ordering fields return 400"""
+        response = self.client.get(self.url, {'min_price': 'cheap', 'ordering': 'calories'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('min_price', response.data)
+        self.assertIn('ordering', response.data)
+        
+        for value in ('nan', 'sNaN', 'Infinity', '-inf'):
+            with self.subTest(value=value):
+                response = self.client.get(self.url, {'min_price': value})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('min_price', response.data)
+    
+    def test_name_ordering_ignores_case(self):
+        """Test that mixed-case names are ordered case-insensitively"""
+        self.create_menu_item('apple tart', '5.00', self.desserts)
+        expected = ['apple tart', 'Cake', 'Pasta', 'Pizza', 'Steak']
+        self.assertEqual(self.names(ordering='name'), expected)
+        self.assertEqual(self.db_names(ordering='name'), expected)
+        self.assertEqual(self.db_names(ordering='-name'), expected[::-1])
+    
+    def test_snapshot_serves_only_category_and_featured_filters(self):
+        """Test that price ranges and orderings are read from the table, other lists from the snapshot"""
+        self.client.get(self.url)
+        for params in ({}, {'category': 'main-course'}, {'featured': 'true'}):
+            with self.subTest(params=params), self.assertNumQueries(0):
+                self.client.get(self.url, params)
+        for params in ({'min_price': '5'}, {'ordering': 'name'}):
+            with self.subTest(params=params):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(self.url, params)
+                self.assertTrue(any(MenuItem._meta.db_table in query['sql'] for query in queries))
+    
+    def test_query_plans_use_menu_item_indexes(self):
+        """Test that filtered and ordered queries are planned on the MenuItem indexes"""
+        index_names = [index.name for index in MenuItem._meta.indexes]
+        cases = [
+            {'category': str(self.mains.pk), 'featured': 'true', 'min_price': '5'},
+            {'category': 'main-course', 'ordering': 'price'},
+            {'featured': 'true', 'ordering': 'price'},
+            {'min_price': '5', 'max_price': '15'},
+            {'ordering': 'name'},
+            {'ordering': '-created_at'},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                plan = MenuItemFilter(params).filter_queryset(MenuItem.objects.all()).explain()
+                self.assertTrue(
+                    any(name in plan for name in index_names),
+                    f'No MenuItem index in plan: {plan}'
+                )
+    
+    def test_sparse_fieldsets_on_snapshot_reads(self):
+        """Test that list and search reads from the snapshot honour ?fields= and ?expand="""
+        response = self.client.get(self.url, {'fields': 'name,category', 'category': 'desserts'})
+        self.assertEqual(response.data['results'][0], {'name': 'Cake', 'category': self.desserts.pk})
+        
+        response = self.client.get(self.url, {'fields': 'name,category.slug', 'expand': 'category', 'category': 'desserts'})
+        self.assertEqual(response.data['results'][0], {'name': 'Cake', 'category': {'slug': 'desserts'}})
+        
+        response = self.client.get(reverse('littlelemonapi:menuitem-search'), {'q': 'steak', 'fields': 'id,image'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'image'})
+        self.assertTrue(response.data['results'][0]['image'].startswith('http://testserver/'))
+    
+    def test_default_output_is_unchanged(self):
+        """Test that without ?fields= or ?expand= every field and relation is returned"""
+        item = self.client.get(self.url, {'ordering': 'name'}).data['results'][0]
+        self.assertEqual(item['category']['slug'], 'desserts')
+        self.assertIn('description', item)
+
+class ImageVariantsTest(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        self.user = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+    
+    def upload(self, size=(2000, 1000), mode='RGB'):
+        buffer = io.BytesIO()
+        Image.new(mode, size, 'orange').save(buffer, 'PNG')
+        return SimpleUploadedFile('dish.png', buffer.getvalue(), content_type='image/png')
+    
+    def create_item(self, **kwargs):
+        category = Category.objects.get_or_create(name='Main Course', slug='main-course')[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            item = MenuItem.objects.create(
+                name='Pizza', price=Decimal('12.50'), description='Test dish',
+                image=self.upload(**kwargs), category=category
+            )
+        item.refresh_from_db()
+        return item
+    
+    def test_upload_generates_variants(self):
+        """Test that an upload produces each size in WebP and JPEG"""
+        item = self.create_item(mode='RGBA')
+        self.assertEqual(
+            {name: entry['width'] for name, entry in item.image_variants.items()},
+            {'thumb': 160, 'card': 480, 'full': 1200}
+        )
+        self.assertEqual(item.image_variants['card']['height'], 240)
+        for entry in item.image_variants.values():
+            for key, image_format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+                with default_storage.open(entry[key]) as stored, Image.open(stored) as image:
+                    self.assertEqual(image.format, image_format)
+                    self.assertEqual(image.width, entry['width'])
+    
+    def test_small_uploads_are_not_upscaled(self):
+        """Test that variants never exceed the uploaded size"""
+        item = self.create_item(size=(300, 200))
+        self.assertEqual([entry['width'] for entry in item.image_variants.values()], [160, 300, 300])
+        self.assertEqual(item.image_sources['webp'].count('w,'), 1)
+    
+    def test_new_image_clears_variants(self):
+        """Test that replacing the image drops the old variants until the new ones are built"""
+        item = self.create_item()
+        item.image = self.upload(size=(100, 100))
+        item.save()
+        self.assertEqual(item.image_variants, {})
+    
+    def test_stale_job_does_not_overwrite_newer_image(self):
+        """Test that variants rendered for a replaced image are discarded"""
+        item = self.create_item()
+        render = images.render_variants
+        
+        def render_then_replace(field_file):
+            variants = render(field_file)
+            MenuItem.objects.filter(pk=item.pk).update(image='menu_images/newer.png', image_variants={})
+            return variants
+        
+        with mock.patch.object(images, 'render_variants', render_then_replace):
+            generate_image_variants(item._meta.label, item.pk, item.image.name)
+        item.refresh_from_db()
+        self.assertEqual((item.image.name, item.image_variants), ('menu_images/newer.png', {}))
+    
+    def test_api_exposes_variant_urls(self):
+        """Test that menu item reads return absolute variant URLs"""
+        item = self.create_item()
+        url = reverse('littlelemonapi:menuitem-detail', kwargs={'id': item.pk})
+        variants = self.client.get(url).data['image_variants']
+        self.assertTrue(variants['thumb']['webp'].startswith('http://testserver/media/variants/'))
+        
+        listed = self.client.get(reverse('littlelemonapi:menuitem-list')).data['results'][0]
+        self.assertEqual(listed['image_variants'], variants)
+
+class CatalogImportExportTest(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='testpass123'
+        )
+        self.manager.groups.add(Group.objects.get_or_create(name='Manager')[0])
+        self.client.force_authenticate(user=self.manager)
+        self.mains = Category.objects.create(name='Main Course', slug='main-course')
+        self.pizza = MenuItem.objects.create(
+            name='Pizza', price=Decimal('12.50'), description='Test dish', category=self.mains
+        )
+    
+    def upload(self, name, content):
+        return self.client.post(
+            reverse('littlelemonapi:menuitem-import'),
+            {'file': SimpleUploadedFile(name, content.encode())},
+            format='multipart'
+        )
+    
+    def test_import_upserts_in_batches_and_reports_row_errors(self):
+        """Test that imports create, update and reject rows with a fixed query count per batch"""
+        rows = ['name,description,price,category,is_featured']
+        rows += [f'Dish {i},Test dish,{i + 1}.00,Desserts,true' for i in range(50)]
+        rows += ['Pizza,Now with basil,13.00,main-course,false', 'Broken,,cheap,main-course,']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload('menu.csv', '\n'.join(rows))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['updated']), (50, 1))
+        self.assertEqual([error['row'] for error in response.data['errors']], [53])
+        self.assertIn('price', response.data['errors'][0]['errors'])
+        self.assertLess(len(queries), 20)
+        
+        self.assertEqual(MenuItem.objects.filter(category__slug='desserts', is_featured=True).count(), 50)
+        self.pizza.refresh_from_db()
+        self.assertEqual((self.pizza.price, self.pizza.description), (Decimal('13.00'), 'Now with basil'))
+        self.assertTrue(Category.objects.filter(name='Desserts').exists())
+    
+    def test_partial_rows_keep_omitted_fields(self):
+        """Test that columns left out of an import keep their values and updated_at moves forward"""
+        MenuItem.objects.filter(pk=self.pizza.pk).update(is_featured=True, image='menu_images/pizza.jpg')
+        self.pizza.refresh_from_db()
+        response = self.upload('menu.csv', 'name,price,category\nPizza,14.00,main-course')
+        self.assertEqual(response.data['updated'], 1)
+        
+        item = MenuItem.objects.get(pk=self.pizza.pk)
+        self.assertEqual(item.price, Decimal('14.00'))
+        self.assertEqual(
+            (item.description, item.is_featured, item.image.name),
+            ('Test dish', True, 'menu_images/pizza.jpg')
+        )
+        self.assertGreater(item.updated_at, self.pizza.updated_at)
+    
+    def test_export_round_trips_through_import(self):
+        """Test that both export formats stream every item and import back unchanged"""
+        for output, name in (('csv', 'menu.csv'), ('jsonl', 'menu.jsonl')):
+            with self.subTest(output=output):
+                response = self.client.get(reverse('littlelemonapi:menuitem-export'), {'output': output})
+                self.assertTrue(response.streaming)
+                content = b''.join(response.streaming_content).decode()
+                self.assertIn('Pizza', content)
+                
+                response = self.upload(name, content)
+                self.assertEqual((response.data['created'], response.data['updated']), (0, 1))
+                self.assertEqual(response.data['errors'], [])
+        self.assertEqual(MenuItem.objects.count(), 1)
+    
+    def test_import_export_require_manager(self):
+        """Test that customers cannot import or export the catalog"""
+        customer = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=customer)
+        response = self.client.get(reverse('littlelemonapi:menuitem-export'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.upload('menu.csv', 'name,price,category\nSoup,5.00,main-course')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_management_commands(self):
+        """Test export_menu and import_menu on files"""
+        path = os.path.join(tempfile.mkdtemp(), 'menu.jsonl')
+        self.addCleanup(os.remove, path)
+        call_command('export_menu', path, stderr=StringIO())
+        MenuItem.objects.filter(pk=self.pizza.pk).update(price=Decimal('1.00'))
+        
+        out = StringIO()
+        call_command('import_menu', path, stdout=out)
+        self.assertIn('Created 0 and updated 1 menu items', out.getvalue())
+        self.pizza.refresh_from_db()
+        self.assertEqual(self.pizza.price, Decimal('12.50'))
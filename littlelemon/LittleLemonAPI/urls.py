@@ -13,6 +13,9 @@ urlpatterns = [
     
     # Menu Items
     path('menu-items/', views.MenuItemListCreateView.as_view(), name='menuitem-list'),
+    path('menu-items/search/', views.MenuItemSearchView.as_view(), name='menuitem-search'),
+    path('menu-items/export/', views.MenuItemExportView.as_view(), name='menuitem-export'),
+    path('menu-items/import/', views.MenuItemImportView.as_view(), name='menuitem-import'),
     path('menu-items/<int:id>/', views.MenuItemRetrieveUpdateDestroyView.as_view(), name='menuitem-detail'),
     
     # Cart
@@ -20,8 +23,16 @@ urlpatterns = [
     
     # Orders
     path('orders/', views.OrderListCreateView.as_view(), name='order-list'),
+    path('orders/events/', views.order_events, name='order-events'),
+    path('orders/history/', views.ArchivedOrderListView.as_view(), name='order-history'),
+    path('orders/history/<int:pk>/', views.ArchivedOrderDetailView.as_view(), name='order-history-detail'),
+    path('orders/bulk/', views.OrderBulkUpdateView.as_view(), name='order-bulk-update'),
+    path('orders/dispatch/', views.OrderDispatchView.as_view(), name='order-dispatch'),
     path('orders/<int:pk>/', views.OrderRetrieveUpdateDestroyView.as_view(), name='order-detail'),
     
+    # Reports
+    path('reports/sales/', views.SalesReportView.as_view(), name='sales-report'),
+    
     # User Groups
     path('groups/manager/users/', views.ManagerUserListView.as_view(), name='manager-list'),
     path('groups/manager/users/<int:pk>/', views.ManagerUserDetailView.as_view(), name='manager-detail'),
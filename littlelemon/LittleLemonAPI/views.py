@@ -1,18 +1,69 @@
-from rest_framework import generics, status, permissions
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions, generics, status, permissions
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models import QuerySet, Sum
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+import csv
+from datetime import date, timedelta
+from decimal import Decimal
 
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from .models import (
+    Category, MenuItem, Order, OrderItem, ArchivedOrder,
+    MenuItemDailySales, CategoryDailySales,
+)
+from . import catalog_io
+from .carts import get_cart_backend
+from .catalog import catalog_etag, catalog_last_modified
+from .compiled import CompiledListMixin
+from .dispatch import dispatch_pending_orders
+from .events import order_event, publish_on_commit, stream_order_events
+from .fieldsets import FieldSpec
+from .filters import MenuItemFilter, MenuItemFilterBackend
+from .pagination import OrderCursorPagination
+from .permissions import IsManager
+from .reports import apply_order_sales
+from .roles import MANAGER, DELIVERY_CREW, get_user_roles, has_role
+from .snapshot import get_menu_snapshot
 from .serializers import (
-    CategorySerializer, MenuItemSerializer, CartSerializer,
-    OrderSerializer, OrderItemSerializer, UserSerializer
+    CategorySerializer, MenuItemSerializer, CartSerializer, CartSummarySerializer,
+    OrderSerializer, OrderItemSerializer, UserSerializer, OrderBulkUpdateSerializer,
+    ArchivedOrderSerializer, SalesReportRowSerializer
 )
 
 User = get_user_model()
 
+# Answers If-None-Match / If-Modified-Since with 304 before any catalog query runs
+catalog_condition = method_decorator(
+    condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified),
+    name='get'
+)
+
+class EagerLoadingViewMixin:
+    """
+    Applies the serializer's declared select/prefetch plan to every queryset
+    the view lists or looks objects up in, trimmed to the relations the
+    request's ?fields= / ?expand= actually render.
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset, FieldSpec.from_request(self.request))
+        return queryset
+
 # Category Views
+@catalog_condition
 class CategoryListCreateView(generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -23,6 +74,7 @@ class CategoryListCreateView(generics.ListCreateAPIView):
             return [IsAdminUser()]
         return super().get_permissions()
 
+@catalog_condition
 class CategoryRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -30,29 +82,77 @@ class CategoryRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAdminUser]
 
 # Menu Item Views
-class MenuItemListCreateView(generics.ListCreateAPIView):
-    queryset = MenuItem.objects.select_related('category').all()
+def render_snapshot_records(request, records):
+    """
+    Snapshot records hold relative media URLs and every field; match what
+    the serializer would return for this request.
+    """
+    spec = FieldSpec.from_request(request)
+    rendered = []
+    for record in records:
+        if record['image']:
+            record = {
+                **record,
+                'image': request.build_absolute_uri(record['image']),
+                'image_variants': {
+                    variant: {
+                        key: request.build_absolute_uri(value) if isinstance(value, str) else value
+                        for key, value in entry.items()
+                    }
+                    for variant, entry in record['image_variants'].items()
+                },
+            }
+        rendered.append(spec.apply(record, MenuItemSerializer.expandable_fields))
+    return rendered
+
+@catalog_condition
+class MenuItemListCreateView(EagerLoadingViewMixin, generics.ListCreateAPIView):
+    queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [MenuItemFilterBackend]
     
     def get_permissions(self):
         if self.request.method == 'POST':
             return [IsAdminUser()]
         return super().get_permissions()
     
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        category = self.request.query_params.get('category')
-        featured = self.request.query_params.get('featured')
+    def list(self, request, *args, **kwargs):
+        item_filter = MenuItemFilter(request.query_params)
+        if not item_filter.served_by_snapshot:
+            # Price ranges and orderings go through filter_backends to the indexed table
+            return super().list(request, *args, **kwargs)
+        # Everything else is answered from the worker's in-memory menu snapshot
+        records = item_filter.filter_records(get_menu_snapshot(request))
+        page = self.paginate_queryset(records)
+        if page is not None:
+            return self.get_paginated_response(render_snapshot_records(request, page))
+        return Response(render_snapshot_records(request, records))
+
+@catalog_condition
+class MenuItemSearchView(generics.GenericAPIView):
+    """
+    Ranked search over menu item names, descriptions and category names,
+    tolerant of prefixes and single typos.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, format=None):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {"error": "Provide a search query with ?q=."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if category:
-            queryset = queryset.filter(category__name__iexact=category)
-        if featured and featured.lower() == 'true':
-            queryset = queryset.filter(is_featured=True)
-            
-        return queryset
+        records = get_menu_snapshot(request).search(query)
+        page = self.paginate_queryset(records)
+        if page is not None:
+            return self.get_paginated_response(render_snapshot_records(request, page))
+        return Response(render_snapshot_records(request, records))
 
-class MenuItemRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+@catalog_condition
+class MenuItemRetrieveUpdateDestroyView(EagerLoadingViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
     lookup_field = 'id'
@@ -62,48 +162,146 @@ class MenuItemRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
             return [IsAdminUser()]
         return [IsAuthenticated()]
 
+class MenuItemExportView(APIView):
+    """
+    Streams the whole catalog as CSV (?output=csv, the default) or JSONL
+    (?output=jsonl) in the format MenuItemImportView accepts.
+    """
+    permission_classes = [IsManager]
+    
+    def get(self, request, format=None):
+        file_format = request.query_params.get('output', 'csv')
+        if file_format not in catalog_io.FORMATS:
+            return Response(
+                {"error": "output must be 'csv' or 'jsonl'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        response = StreamingHttpResponse(
+            catalog_io.export_menu(file_format),
+            content_type=catalog_io.CONTENT_TYPES[file_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="menu.{file_format}"'
+        return response
+
+class MenuItemImportView(APIView):
+    """
+    Upserts menu items from an uploaded CSV or JSONL `file`, read in batches.
+    Returns created/updated counts and the errors of rejected rows.
+    """
+    permission_classes = [IsManager]
+    
+    def post(self, request, format=None):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {"error": "Upload a CSV or JSONL file as 'file'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        file_format = request.data.get('input') or catalog_io.format_from_name(upload.name)
+        if file_format not in catalog_io.FORMATS:
+            return Response(
+                {"error": "input must be 'csv' or 'jsonl'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            report = catalog_io.import_menu(catalog_io.text_stream(upload), file_format)
+        except (UnicodeDecodeError, csv.Error) as e:
+            return Response({"error": f"Could not read the file: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
 # Cart Views
 class CartView(generics.ListCreateAPIView):
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
     
+    # Lines accepted in one batch POST
+    MAX_BATCH_LINES = 100
+    
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        # A queryset for the database backend, a list of unsaved lines for the cache backend
+        lines = get_cart_backend().lines(self.request.user)
+        if isinstance(lines, QuerySet):
+            lines = self.serializer_class.setup_eager_loading(lines, FieldSpec.from_request(self.request))
+        return lines
+    
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        # Totals cover the whole cart, not just the page of lines
+        summary = get_cart_backend().summary(request.user)
+        if isinstance(response.data, dict):
+            response.data['summary'] = CartSummarySerializer(summary).data
+        else:
+            response.data = {'results': response.data, 'summary': CartSummarySerializer(summary).data}
+        return response
+    
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        # A list of {menu_item_id, quantity} is upserted at once; answer with the whole cart
+        serializer = self.get_serializer(
+            data=request.data, many=True, allow_empty=False, max_length=self.MAX_BATCH_LINES
+        )
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        cart = self.get_serializer(self.get_queryset(), many=True)
+        return Response(cart.data, status=status.HTTP_201_CREATED)
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
     def delete(self, request, *args, **kwargs):
-        Cart.objects.filter(user=request.user).delete()
+        get_cart_backend().clear(request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 # Order Views
-class OrderListCreateView(generics.ListCreateAPIView):
+def orders_visible_to(user, model=Order):
+    """Managers see every order, delivery crew their assignments, customers their own."""
+    if has_role(user, MANAGER):
+        return model.objects.all()
+    elif has_role(user, DELIVERY_CREW):
+        return model.objects.filter(delivery_crew=user)
+    return model.objects.filter(user=user)
+
+class OrderListCreateView(CompiledListMixin, EagerLoadingViewMixin, generics.ListCreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     
+    @property
+    def paginator(self):
+        # ?pagination=cursor (and the cursor links it returns) switches to keyset paging
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = OrderCursorPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+    
     def get_queryset(self):
-        user = self.request.user
-        if user.groups.filter(name='Manager').exists():
-            return Order.objects.all()
-        elif user.groups.filter(name='Delivery Crew').exists():
-            return Order.objects.filter(delivery_crew=user)
-        return Order.objects.filter(user=user)
+        queryset = orders_visible_to(self.request.user)
+        
+        order_status = self.request.query_params.get('status')
+        delivery_crew = self.request.query_params.get('delivery_crew')
+        
+        if order_status:
+            queryset = queryset.filter(status=order_status)
+        if delivery_crew:
+            try:
+                queryset = queryset.filter(delivery_crew_id=int(delivery_crew))
+            except ValueError:
+                return Order.objects.none()
+        
+        return queryset.order_by('-created_at', '-id')
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class OrderRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class OrderRetrieveUpdateDestroyView(EagerLoadingViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-        if user.groups.filter(name='Manager').exists():
-            return Order.objects.all()
-        elif user.groups.filter(name='Delivery Crew').exists():
-            return Order.objects.filter(delivery_crew=user)
-        return Order.objects.filter(user=user)
+        return orders_visible_to(self.request.user)
     
     def get_permissions(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -113,54 +311,259 @@ class OrderRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     
     def perform_update(self, serializer):
         user = self.request.user
-        if user.groups.filter(name='Delivery Crew').exists():
+        if has_role(user, DELIVERY_CREW):
             # Only allow delivery crew to update status
             if 'status' in self.request.data:
                 serializer.save()
         else:
             serializer.save()
 
+class ArchivedOrderListView(CompiledListMixin, EagerLoadingViewMixin, generics.ListAPIView):
+    """
+    Order history that has been moved out of the live tables by archive_orders.
+    """
+    serializer_class = ArchivedOrderSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return orders_visible_to(self.request.user, ArchivedOrder).order_by('-created_at', '-id')
+
+class ArchivedOrderDetailView(EagerLoadingViewMixin, generics.RetrieveAPIView):
+    serializer_class = ArchivedOrderSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return orders_visible_to(self.request.user, ArchivedOrder)
+
+class OrderBulkUpdateView(APIView):
+    """
+    Updates status and/or delivery crew on many orders at once, with the same
+    role rules as a single order update. Returns a result per requested ID.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, format=None):
+        user = request.user
+        serializer = OrderBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        changes = {}
+        if 'status' in data:
+            changes['status'] = data['status']
+        if 'delivery_crew' in data:
+            # Only managers may (re)assign orders
+            if not has_role(user, MANAGER):
+                return Response(
+                    {"error": "Only managers can assign delivery crew."},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            changes['delivery_crew_id'] = data['delivery_crew']
+        
+        ids = data['ids']
+        with transaction.atomic():
+            rows = list(
+                orders_visible_to(user).select_for_update()
+                .filter(pk__in=ids)
+                .values_list('pk', 'user_id', 'status', 'delivery_crew_id')
+            )
+            found = [row[0] for row in rows]
+            if found:
+                Order.objects.filter(pk__in=found).update(**changes, updated_at=timezone.now())
+            
+            events = []
+            cancelled, restored = [], []
+            for order_id, user_id, old_status, old_crew_id in rows:
+                new_status = changes.get('status', old_status)
+                new_crew_id = changes.get('delivery_crew_id', old_crew_id)
+                if old_status != 'cancelled' and new_status == 'cancelled':
+                    cancelled.append(order_id)
+                elif old_status == 'cancelled' and new_status != 'cancelled':
+                    restored.append(order_id)
+                changed = []
+                if new_status != old_status:
+                    changed.append('status')
+                if new_crew_id != old_crew_id:
+                    changed.append('delivery_crew')
+                if changed:
+                    events.append(order_event(
+                        order_id, user_id, new_status, new_crew_id, changed,
+                        previous_delivery_crew_id=old_crew_id if 'delivery_crew' in changed else None
+                    ))
+            publish_on_commit(*events)
+            apply_order_sales(cancelled, sign=-1)
+            apply_order_sales(restored)
+        
+        found = set(found)
+        results = [
+            {'id': order_id, 'updated': True} if order_id in found
+            else {'id': order_id, 'updated': False, 'error': 'Not found.'}
+            for order_id in ids
+        ]
+        return Response({'updated': len(found), 'results': results})
+
+class OrderDispatchView(APIView):
+    """
+    Assigns pending orders to delivery crew members by open-order load.
+    """
+    permission_classes = [IsManager]
+    
+    def post(self, request, format=None):
+        limit = request.data.get('limit')
+        try:
+            limit = int(limit) if limit is not None else None
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "limit must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        assigned = dispatch_pending_orders(limit=limit)
+        return Response({
+            'assigned': sum(assigned.values()),
+            'delivery_crew': {str(crew_id): count for crew_id, count in assigned.items()}
+        })
+
+def authenticate_stream_request(request):
+    """Authenticate a plain Django request with the API's authentication classes."""
+    drf_request = Request(
+        request,
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    try:
+        user = drf_request.user
+    except exceptions.AuthenticationFailed:
+        return None
+    return user if user.is_authenticated else None
+
+async def order_events(request):
+    """
+    Server-Sent Events stream of order status and assignment changes, scoped
+    to the caller's role. Needs the ASGI application to stream without
+    holding a worker thread per client.
+    """
+    user = await sync_to_async(authenticate_stream_request)(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    async def load_roles():
+        # Skip the roles memoized on the user so changes are seen
+        user.__dict__.pop('_littlelemon_roles', None)
+        return await sync_to_async(get_user_roles)(user)
+    
+    response = StreamingHttpResponse(
+        stream_order_events(user.pk, load_roles),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# Report Views
+class SalesReportView(APIView):
+    """
+    Quantity and revenue per menu item or category over a date range,
+    answered from the daily sales rollups rather than raw orders.
+    """
+    permission_classes = [IsManager]
+    
+    ROLLUPS = {
+        'menu_item': (MenuItemDailySales, 'menu_item'),
+        'category': (CategoryDailySales, 'category'),
+    }
+    
+    def get(self, request, format=None):
+        try:
+            end = date.fromisoformat(request.query_params.get('end') or date.today().isoformat())
+            start = date.fromisoformat(
+                request.query_params.get('start') or (end - timedelta(days=29)).isoformat()
+            )
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        group_by = request.query_params.get('group_by', 'menu_item')
+        if group_by not in self.ROLLUPS:
+            return Response(
+                {"error": "group_by must be 'menu_item' or 'category'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        model, key = self.ROLLUPS[group_by]
+        
+        rows = [
+            {
+                'id': row[f'{key}_id'],
+                'name': row[f'{key}__name'],
+                'quantity': row['quantity'],
+                'revenue': row['revenue'],
+            }
+            for row in model.objects.filter(date__range=(start, end))
+            .values(f'{key}_id', f'{key}__name')
+            .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+            .order_by('-revenue', f'{key}_id')
+        ]
+        totals = SalesReportRowSerializer({
+            'id': 0,
+            'name': 'Total',
+            'quantity': sum(row['quantity'] for row in rows),
+            'revenue': sum((row['revenue'] for row in rows), Decimal('0')),
+        }).data
+        
+        return Response({
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'group_by': group_by,
+            'quantity': totals['quantity'],
+            'revenue': totals['revenue'],
+            'results': SalesReportRowSerializer(rows, many=True).data,
+        })
+
 # User Management Views
 class ManagerUserListView(generics.ListCreateAPIView):
-    queryset = User.objects.filter(groups__name='Manager')
+    queryset = User.objects.filter(groups__name=MANAGER)
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
     
     def perform_create(self, serializer):
         user = serializer.save()
-        manager_group = Group.objects.get(name='Manager')
+        manager_group = Group.objects.get(name=MANAGER)
         user.groups.add(manager_group)
         user.save()
 
 class ManagerUserDetailView(generics.DestroyAPIView):
-    queryset = User.objects.filter(groups__name='Manager')
+    queryset = User.objects.filter(groups__name=MANAGER)
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
     
     def get_object(self):
         user = get_object_or_404(User, pk=self.kwargs['pk'])
-        if not user.groups.filter(name='Manager').exists():
+        if not has_role(user, MANAGER):
             raise Http404("No manager found with the given ID.")
         return user
 
 class DeliveryCrewUserListView(generics.ListCreateAPIView):
-    queryset = User.objects.filter(groups__name='Delivery Crew')
+    queryset = User.objects.filter(groups__name=DELIVERY_CREW)
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser | permissions.IsAdminUser]
     
     def perform_create(self, serializer):
         user = serializer.save()
-        delivery_group = Group.objects.get(name='Delivery Crew')
+        delivery_group = Group.objects.get(name=DELIVERY_CREW)
         user.groups.add(delivery_group)
         user.save()
 
 class DeliveryCrewUserDetailView(generics.DestroyAPIView):
-    queryset = User.objects.filter(groups__name='Delivery Crew')
+    queryset = User.objects.filter(groups__name=DELIVERY_CREW)
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
     
     def get_object(self):
         user = get_object_or_404(User, pk=self.kwargs['pk'])
-        if not user.groups.filter(name='Delivery Crew').exists():
+        if not has_role(user, DELIVERY_CREW):
             raise Http404("No delivery crew member found with the given ID.")
         return user
@@ -75,6 +75,16 @@ TEMPLATES = [
     },
 ]
 
+if not DEBUG:
+    # Parse and compile each template once per process instead of per render
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'littlelemon.wsgi.application'
 
 
@@ -135,6 +145,31 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Seconds a user's roles stay cached; group changes invalidate them sooner. Invalidation only
+# reaches other processes through a shared cache (Redis, Memcached): with the default per-process
+# cache, roles are cached for at most a few seconds so revoked roles stop working promptly
+ROLE_CACHE_TIMEOUT = 60 * 15
+
+# Seconds rendered menu pages and item fragments stay cached; edits invalidate them sooner. As with
+# roles, pages in the default per-process cache are kept for at most a few seconds, since edits
+# made in one process can't invalidate another's copy
+MENU_CACHE_TIMEOUT = 60 * 15
+
+# Threads resizing uploaded menu images; 0 generates variants inline after commit
+IMAGE_VARIANT_WORKERS = 2
+
+# Where cart lines are kept: LittleLemonAPI.carts.DatabaseCartBackend writes every change to
+# the Cart table; LittleLemonAPI.carts.CacheCartBackend keeps them in the cache and writes them
+# at checkout and on `manage.py flush_carts` (run it periodically; needs a cache shared by
+# every process, such as Redis or Memcached)
+CART_BACKEND = 'LittleLemonAPI.carts.DatabaseCartBackend'
+
+# Seconds an idle cart stays in the cache with CacheCartBackend; flush_carts must run more often
+CART_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Days after their last change that cart lines are deleted by `manage.py sweep_carts`
+CART_EXPIRY_DAYS = 14
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -2,6 +2,25 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import MenuItem
+from .models import MenuEntry, MenuItem
 
 admin.site.register(MenuItem)
+
+@admin.register(MenuEntry)
+class MenuEntryAdmin(admin.ModelAdmin):
+    """
+    Read-only view of what the public menu shows. Edit menu items in the
+    LittleLemonAPI catalog; entries follow automatically.
+    """
+    list_display = ['name', 'category_name', 'price_text', 'is_featured', 'synced_at']
+    list_filter = ['is_featured', 'category_name']
+    search_fields = ['name']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
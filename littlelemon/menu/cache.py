@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.http import HttpResponse
+
+MENU_PAGE_CACHE_KEY = 'menu:page:list'
+
+# {% cache %} fragment holding one item's card on the menu page
+MENU_CARD_FRAGMENT = 'menu_card'
+
+# Most seconds pages are cached in a per-process cache, which edits made in
+# other processes can't invalidate
+LOCAL_MENU_CACHE_TIMEOUT = 5
+
+def menu_cache_timeout():
+    """
+    MENU_CACHE_TIMEOUT when the default cache is shared by every process,
+    otherwise no more than LOCAL_MENU_CACHE_TIMEOUT, so an edit shows on
+    every worker's pages within seconds.
+    """
+    if isinstance(caches['default'], (LocMemCache, DummyCache)):
+        return min(settings.MENU_CACHE_TIMEOUT, LOCAL_MENU_CACHE_TIMEOUT)
+    return settings.MENU_CACHE_TIMEOUT
+
+def menu_item_page_cache_key(item_id):
+    return f'menu:page:item:{item_id}'
+
+def cached_page(key, render_page):
+    """
+    Serve a whole rendered page from the cache, calling render_page() to
+    build and store it on a miss.
+    """
+    content = cache.get(key)
+    if content is not None:
+        return HttpResponse(content)
+    response = render_page()
+    cache.set(key, response.content, menu_cache_timeout())
+    return response
+
+def invalidate_menu_item(item_id):
+    """Drop the menu page, the item's page and the item's card fragment."""
+    keys = [
+        MENU_PAGE_CACHE_KEY,
+        menu_item_page_cache_key(item_id),
+        make_template_fragment_key(MENU_CARD_FRAGMENT, [item_id]),
+    ]
+    cache.delete_many(keys)
+    # Drop them again on commit in case a reader re-cached the old rows meanwhile
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from menu.projection import rebuild_menu_projection
+
+class Command(BaseCommand):
+    help = 'Rebuilds the public menu entries from the LittleLemonAPI catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of menu items to project per transaction (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_menu_projection(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Projected {count} menu items'))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0007_menuitem_image_variants'),
+        ('menu', '0002_menuitem_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuEntry',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='menu_entry', serialize=False, to='LittleLemonAPI.menuitem')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('price_text', models.CharField(max_length=16)),
+                ('category_name', models.CharField(max_length=100)),
+                ('category_slug', models.SlugField()),
+                ('is_featured', models.BooleanField(default=False)),
+                ('image_url', models.CharField(blank=True, max_length=255)),
+                ('image_sources', models.JSONField(blank=True, null=True)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Menu entries',
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['name'], name='menuentry_name_idx'), models.Index(fields=['is_featured', 'name'], name='menuentry_featured_name_idx')],
+            },
+        ),
+    ]
@@ -2,8 +2,9 @@ from django.db import models
 
 # Create your models here.
 from django.db import models
+from LittleLemonAPI.images import ImageVariantsMixin
 
-class MenuItem(models.Model):
+class MenuItem(ImageVariantsMixin, models.Model):
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=6, decimal_places=2)
     description = models.TextField()
@@ -11,3 +12,38 @@ class MenuItem(models.Model):
 
     def __str__(self):
         return self.name
+
+class MenuEntry(models.Model):
+    """
+    Render-ready copy of one LittleLemonAPI menu item for the public site.
+    Kept in sync by signals and rebuilt by rebuild_menu_projection; never
+    edited directly.
+    """
+    item = models.OneToOneField(
+        'LittleLemonAPI.MenuItem',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='menu_entry'
+    )
+    name = models.CharField(max_length=100)
+    description = models.TextField()
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    price_text = models.CharField(max_length=16)
+    category_name = models.CharField(max_length=100)
+    category_slug = models.SlugField()
+    is_featured = models.BooleanField(default=False)
+    image_url = models.CharField(max_length=255, blank=True)
+    # srcset strings and fallback src for <picture>, or null until variants exist
+    image_sources = models.JSONField(null=True, blank=True)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['name'], name='menuentry_name_idx'),
+            models.Index(fields=['is_featured', 'name'], name='menuentry_featured_name_idx'),
+        ]
+        verbose_name_plural = 'Menu entries'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,65 @@
+from django.db import transaction
+from LittleLemonAPI.models import MenuItem as CatalogItem
+
+from .cache import invalidate_menu_item
+from .models import MenuEntry
+
+PROJECTED_FIELDS = [
+    'name', 'description', 'price', 'price_text', 'category_name', 'category_slug',
+    'is_featured', 'image_url', 'image_sources',
+]
+
+def project(item):
+    """The MenuEntry row for a catalog item loaded with its category."""
+    return MenuEntry(
+        item_id=item.pk,
+        name=item.name,
+        description=item.description,
+        price=item.price,
+        price_text=f'${item.price:.2f}',
+        category_name=item.category.name,
+        category_slug=item.category.slug,
+        is_featured=item.is_featured,
+        image_url=item.image.url if item.image else '',
+        image_sources=item.image_sources,
+    )
+
+def sync_menu_entries(item_ids):
+    """
+    Bring the entries for the given catalog item ids up to date, removing
+    entries whose item is gone. Costs a fixed number of queries.
+    """
+    item_ids = set(item_ids)
+    if not item_ids:
+        return
+    with transaction.atomic():
+        entries = [
+            project(item)
+            for item in CatalogItem.objects.select_related('category').filter(pk__in=item_ids)
+        ]
+        # Make sure every row exists, then write the projected values at once
+        MenuEntry.objects.bulk_create(entries, ignore_conflicts=True)
+        MenuEntry.objects.bulk_update(entries, PROJECTED_FIELDS)
+        MenuEntry.objects.filter(pk__in=item_ids - {entry.pk for entry in entries}).delete()
+    for item_id in item_ids:
+        invalidate_menu_item(item_id)
+
+def rebuild_menu_projection(chunk_size=500):
+    """
+    Re-project the whole catalog. Returns the number of entries written.
+    """
+    written = 0
+    last_id = 0
+    while True:
+        # Walk the catalog by primary key so each chunk is an index range scan
+        ids = list(
+            CatalogItem.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+        sync_menu_entries(ids)
+        written += len(ids)
+    return written
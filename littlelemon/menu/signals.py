@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from LittleLemonAPI.models import Category, MenuItem as CatalogItem
+from LittleLemonAPI.signals import menu_items_bulk_changed
+
+from .projection import sync_menu_entries
+
+@receiver(post_save, sender=CatalogItem)
+@receiver(post_delete, sender=CatalogItem)
+def sync_menu_entry(sender, instance, **kwargs):
+    """
+    Re-project a catalog item for the public menu in the same transaction
+    as the change, which also drops its cached pages.
+    """
+    sync_menu_entries([instance.pk])
+
+@receiver(post_save, sender=Category)
+def sync_category_entries(sender, instance, created, **kwargs):
+    """
+    Menu entries carry their category's name and slug.
+    """
+    if not created:
+        sync_menu_entries(instance.menu_items.values_list('pk', flat=True))
+
+@receiver(menu_items_bulk_changed)
+def sync_bulk_entries(sender, item_ids, **kwargs):
+    sync_menu_entries(item_ids)
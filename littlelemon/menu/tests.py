@@ -1,8 +1,17 @@
-from django.test import TestCase, Client
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
+from django.template.loader import render_to_string
+from django.core.cache import cache
+from django.core.management import call_command
 from django.contrib.auth import get_user_model
 from rest_framework import status
 from rest_framework.test import APITestCase
+from LittleLemonAPI.models import Category, MenuItem as CatalogItem
+from .cache import LOCAL_MENU_CACHE_TIMEOUT, menu_cache_timeout
+from .models import MenuEntry, MenuItem
 
 User = get_user_model()
 
@@ -10,6 +19,8 @@ class MenuViewTest(TestCase):
     def setUp(self):
         # Set up test client
         self.client = Client()
+        # Rendered pages are cached across tests otherwise
+        cache.clear()
         
     def test_menu_page_loads(self):
         """Test that the menu page loads successfully"""
@@ -24,11 +35,112 @@ class MenuViewTest(TestCase):
         self.assertContains(response, 'Our Menu')
         # Add more specific assertions based on your template
 
+    def create_catalog_item(self, name='Pizza', price='12.50', **kwargs):
+        category = Category.objects.get_or_create(name='Main Course', slug='main-course')[0]
+        return CatalogItem.objects.create(
+            name=name, price=Decimal(price), description='Test dish', category=category, **kwargs
+        )
+
+    def test_menu_page_uses_image_variants(self):
+        """Test that menu cards offer resized WebP and JPEG variants through srcset"""
+        item = self.create_catalog_item(image='menu_images/pizza.png')
+        item.image_variants = {
+            name: {
+                'width': width,
+                'height': width,
+                'webp': f'variants/menu_images/pizza/{name}.webp',
+                'jpeg': f'variants/menu_images/pizza/{name}.jpg',
+            }
+            for name, width in (('thumb', 160), ('card', 480), ('full', 1200))
+        }
+        item.save(update_fields=['image_variants'])
+        html = render_to_string('menu/menu.html', {'items': MenuEntry.objects.all(), 'cache_timeout': 60})
+        self.assertIn('/media/variants/menu_images/pizza/thumb.webp 160w', html)
+        self.assertIn('src="/media/variants/menu_images/pizza/card.jpg"', html)
+
+    def test_warm_menu_pages_skip_the_database(self):
+        """Test that cached menu pages are served without queries until an item changes"""
+        item = self.create_catalog_item()
+        other = self.create_catalog_item(name='Soup', price='6.00')
+        detail_url = reverse('menu_item', args=[item.pk])
+        self.client.get(reverse('menu'))
+        self.client.get(detail_url)
+        
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(reverse('menu')), 'Pizza')
+            self.assertContains(self.client.get(detail_url), 'Pizza')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            item.name = 'Margherita'
+            item.save()
+        self.assertContains(self.client.get(reverse('menu')), 'Margherita')
+        self.assertContains(self.client.get(detail_url), 'Margherita')
+        
+        # Only the changed item's card is re-rendered on the next miss
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuEntry.objects.filter(pk=other.pk).update(name='Broth')
+            item.save()
+        self.assertContains(self.client.get(reverse('menu')), 'Soup')
+
+    def test_per_process_cache_keeps_pages_briefly(self):
+        """Test that pages are only cached for seconds unless the cache is shared between processes"""
+        self.assertEqual(menu_cache_timeout(), LOCAL_MENU_CACHE_TIMEOUT)
+        with tempfile.TemporaryDirectory() as location:
+            shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+            with override_settings(CACHES=shared, MENU_CACHE_TIMEOUT=600):
+                self.assertEqual(menu_cache_timeout(), 600)
+
+class MenuProjectionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Main Course', slug='main-course')
+        self.item = CatalogItem.objects.create(
+            name='Pizza', price=Decimal('12.5'), description='Test dish',
+            image='menu_images/pizza.png', category=self.category, is_featured=True
+        )
+    
+    def entry(self):
+        return MenuEntry.objects.get(pk=self.item.pk)
+    
+    def test_catalog_changes_are_projected(self):
+        """Test that catalog saves, category renames and deletes keep entries in sync"""
+        entry = self.entry()
+        self.assertEqual(
+            (entry.name, entry.price_text, entry.category_name, entry.image_url, entry.is_featured),
+            ('Pizza', '$12.50', 'Main Course', '/media/menu_images/pizza.png', True)
+        )
+        
+        self.item.price = 14
+        self.item.save()
+        self.assertEqual(self.entry().price_text, '$14.00')
+        
+        self.category.name = 'Mains'
+        self.category.save()
+        self.assertEqual(self.entry().category_name, 'Mains')
+        
+        self.item.delete()
+        self.assertFalse(MenuEntry.objects.exists())
+    
+    def test_rebuild_command_restores_entries(self):
+        """Test that rebuild_menu_projection re-projects the whole catalog"""
+        MenuEntry.objects.all().delete()
+        CatalogItem.objects.filter(pk=self.item.pk).update(name='Calzone')
+        
+        out = StringIO()
+        call_command('rebuild_menu_projection', stdout=out)
+        self.assertIn('Projected 1 menu items', out.getvalue())
+        self.assertEqual(self.entry().name, 'Calzone')
+    
+    def test_menu_pages_read_the_projection(self):
+        """Test that the public pages show catalog items"""
+        response = Client().get(reverse('menu_item', args=[self.item.pk]))
+        self.assertContains(response, 'Main Course')
+        self.assertContains(response, '$12.50')
+
 class MenuItemModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
         # Set up non-modified objects used by all test methods
-        from .models import MenuItem
         MenuItem.objects.create(
             name='Test Item',
             description='Test Description',
@@ -2,7 +2,8 @@ from django.shortcuts import render
 
 # Create your views here.
 from django.shortcuts import render, get_object_or_404
-from .models import MenuItem
+from .cache import MENU_PAGE_CACHE_KEY, cached_page, menu_cache_timeout, menu_item_page_cache_key
+from .models import MenuEntry
 
 def home(request):
     return render(request, 'menu/home.html')
@@ -11,12 +12,17 @@ def about(request):
     return render(request, 'menu/about.html')
 
 def menu(request):
-    items = MenuItem.objects.all().order_by('name')
-    return render(request, 'menu/menu.html', {'items': items})
+    # Whole page from the cache when warm; on a miss, only cards of changed
+    # items are re-rendered (see the menu_card fragment in menu.html)
+    return cached_page(MENU_PAGE_CACHE_KEY, lambda: render(request, 'menu/menu.html', {
+        'items': MenuEntry.objects.order_by('name'),
+        'cache_timeout': menu_cache_timeout(),
+    }))
 
 def book(request):
     return render(request, 'menu/book.html')
 
 def menu_item(request, item_id):
-    item = get_object_or_404(MenuItem, id=item_id)
-    return render(request, 'menu/menu_item.html', {'item': item})
+    return cached_page(menu_item_page_cache_key(item_id), lambda: render(request, 'menu/menu_item.html', {
+        'item': get_object_or_404(MenuEntry, pk=item_id),
+    }))
@@ -6,6 +6,7 @@ from rest_framework.test import APITestCase, APIClient
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
 from .models import Booking
+from .serializers import BookingSerializer
 from datetime import date, timedelta
 
 User = get_user_model()
@@ -74,6 +75,14 @@ class BookingAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data[0]['first_name'], 'Test User')
     
+    def test_bookings_list_matches_serializer(self):
+        """Test that the compiled list output matches BookingSerializer"""
+        Booking.objects.create(first_name='Second User', reservation_date=self.tomorrow, reservation_slot=18)
+        response = self.client.get(self.list_url)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        expected = BookingSerializer(Booking.objects.order_by('reservation_date', 'reservation_slot'), many=True).data
+        self.assertEqual(results, expected)
+    
     def test_create_booking(self):
         """Test creating a new booking"""
         data = {
@@ -3,11 +3,12 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.utils import timezone
 from django.db.models import Q
+from LittleLemonAPI.compiled import CompiledListMixin
 from .models import Booking
 from .serializers import BookingSerializer, AvailableSlotsSerializer
 from datetime import date, datetime
 
-class BookingListCreateView(generics.ListCreateAPIView):
+class BookingListCreateView(CompiledListMixin, generics.ListCreateAPIView):
     """
     API endpoint that allows bookings to be viewed or created.
     """